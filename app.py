@@ -4,18 +4,17 @@ import dash_bootstrap_components as dbc
 from dash import html, dcc, Input, Output
 import pandas as pd
 import zipfile
+from utils.tables import build_columnar_cache, cached_checksum, files, zip_checksum
+from utils.standings import create_standings_df
 
 
 def extract_zip(zip_file_path_1, zip_file_path_2, extract_to_folder):
-    if not os.path.exists(extract_to_folder):
-        os.makedirs(extract_to_folder)
-        with zipfile.ZipFile(zip_file_path_1, 'r') as zip_ref:
-            zip_ref.extractall(extract_to_folder)
-        with zipfile.ZipFile(zip_file_path_2, 'r') as zip_ref:
-            zip_ref.extractall(extract_to_folder)
-        print(f"Extracted '{zip_file_path_1}' and '{zip_file_path_2}' to '{extract_to_folder}'.")
-    else:
-        print(f"Folder '{extract_to_folder}' already exists. Skipping extraction.")
+    os.makedirs(extract_to_folder, exist_ok=True)
+    with zipfile.ZipFile(zip_file_path_1, 'r') as zip_ref:
+        zip_ref.extractall(extract_to_folder)
+    with zipfile.ZipFile(zip_file_path_2, 'r') as zip_ref:
+        zip_ref.extractall(extract_to_folder)
+    print(f"Extracted '{zip_file_path_1}' and '{zip_file_path_2}' to '{extract_to_folder}'.")
 
 
 def create_seasons_df(games_df):
@@ -44,13 +43,23 @@ zip_file_1 = 'data1.zip'
 zip_file_2 = 'data2.zip'
 data_folder = os.path.join('data', 'clubs.csv')
 
+# The data is extracted and converted to the columnar cache once, and again whenever the zip files change
+source_checksum = zip_checksum([zip_file_1, zip_file_2])
+
 # TODO remove season.csv from gitrepo
-if not os.path.exists(data_folder):
+if not os.path.exists(data_folder) or (source_checksum is not None and source_checksum != cached_checksum()):
     extract_zip(zip_file_1, zip_file_2, 'data/')
     base_dir = os.path.dirname(os.path.abspath(__file__))
     file_path_games = os.path.join(base_dir, 'data', 'games.csv')
     gamesdf = pd.read_csv(file_path_games)
     create_seasons_df(gamesdf)
+    create_standings_df(gamesdf)
+    build_columnar_cache(source_checksum)
+elif not os.path.exists(files["standings"]):
+    # The data was extracted before the standings existed: build them from the extracted games, the zips may be gone
+    create_standings_df(pd.read_csv(files["games"]))
+    if cached_checksum() is not None:
+        build_columnar_cache(cached_checksum(), ["standings"])
 
 from pages import complete_analysis  # Import pages
 
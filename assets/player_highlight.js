@@ -0,0 +1,39 @@
+// Highlighting of the clicked player in the team charts. The figures are rendered on the server, a click only
+// changes the marker opacity here in the browser. The rules match the server side rendering of the same charts,
+// which applies them when the figure is rendered again, e.g. for another team.
+(function () {
+    function playerIds(trace) {
+        // The player ID is the customdata of a point, or the first entry of it
+        return trace.customdata.map(point => Array.isArray(point) ? point[0] : point);
+    }
+
+    function highlightPlayer(clickedPlayerId, figure, dimmedOpacity) {
+        if (!figure || !Array.isArray(figure.data)) {
+            return window.dash_clientside.no_update;
+        }
+
+        const traces = figure.data.filter(trace => Array.isArray(trace.customdata));
+        // Only dim the other players if the clicked player is in this chart
+        const highlight = Boolean(clickedPlayerId) &&
+            traces.some(trace => playerIds(trace).includes(clickedPlayerId));
+
+        const data = figure.data.map(trace => {
+            if (!Array.isArray(trace.customdata)) {
+                return trace;
+            }
+            const opacity = playerIds(trace).map(
+                playerId => (highlight && playerId !== clickedPlayerId) ? dimmedOpacity : 1
+            );
+            return Object.assign({}, trace, {marker: Object.assign({}, trace.marker, {opacity: opacity})});
+        });
+        return Object.assign({}, figure, {data: data});
+    }
+
+    window.dash_clientside = Object.assign({}, window.dash_clientside, {
+        highlight: {
+            marketValueBarChart: (clickedPlayerId, figure) => highlightPlayer(clickedPlayerId, figure, 0.2),
+            playtimeMarketValue: (clickedPlayerId, figure) => highlightPlayer(clickedPlayerId, figure, 0.3),
+            topScorers: (clickedPlayerId, figure) => highlightPlayer(clickedPlayerId, figure, 0.2),
+        }
+    });
+})();
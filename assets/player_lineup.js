@@ -146,6 +146,8 @@
                     Average Match Outcome Points (AMOP). AMOP are calculated by <br/>
                     all the games a player participated in and the outcome of those games.<br/>
                     (A loss results in 0, a draw in 1 a victory in 3 points).<br/>
+                    Season AMOP only counts the games of this season and competition, the form<br/>
+                    the last five games before this one.<br/>
                     Goals and cards are also displayed if available. Please note <br/>
                     that players shooting goals that were not in the initial lineup will not be displayed.
                 `);
@@ -299,7 +301,9 @@
             const maxMarketValue = Math.max(...marketData.map(bar => bar.market_value));
 
             marketData.forEach((bar) => {
-                const barWidth = (bar.market_value / maxMarketValue) * availableWidth;
+                // Players without a valuation in the season have no market value and no bar
+                const hasMarketValue = bar.market_value != null;
+                const barWidth = hasMarketValue ? (bar.market_value / maxMarketValue) * availableWidth : 0;
                 const barHeight = 20;
                 const fontSize = 14;
 
@@ -315,9 +319,11 @@
                             .style("visibility", "visible")
                             .html(`
                                 <strong>${bar.name}</strong><br/>
-                                Market Value: €${bar.market_value.toLocaleString()}<br/>
+                                Market Value: ${hasMarketValue ? `€${bar.market_value.toLocaleString()}` : 'N/A'}<br/>
                                 Position: ${bar.position || 'N/A'}<br/>
-                                AMOP: ${(bar.gpa || 0).toFixed(2)}
+                                AMOP: ${(bar.gpa || 0).toFixed(2)}<br/>
+                                Season AMOP: ${bar.season_gpa != null ? bar.season_gpa.toFixed(2) : 'N/A'}<br/>
+                                Form (last games): ${bar.form != null ? bar.form.toFixed(2) : 'N/A'}
                             `);
                     })
                     .on("mousemove", function (event) {
@@ -329,7 +335,7 @@
                         tooltip.style("visibility", "hidden");
                     });
 
-                const valueText = `${(bar.market_value / 1000000).toFixed(2)}M`;
+                const valueText = hasMarketValue ? `${(bar.market_value / 1000000).toFixed(2)}M` : 'N/A';
                 const valueTextWidth = valueText.length * fontSize * 0.6;
                 const playerNameWidth = bar.name.length * fontSize * 0.6;
 
@@ -409,43 +415,30 @@
         }
     }
 
-    function attachObservers() {
-        const container = document.getElementById('d3-visualization-container');
-        if (!container) {
-            console.error("d3-visualization-container not found.");
-            return;
-        }
-
-        const updateVisualization = () => {
-            //console.log("Raw data-colormap attribute:", container.getAttribute("data-colormap"));
-            
-            const playerData = JSON.parse(container.getAttribute("data-player-data") || "[]");
-            const marketData = JSON.parse(container.getAttribute("data-market-data") || "[]");
-            const colormap = JSON.parse(container.getAttribute("data-colormap") || "{}");
-            
-            //console.log("Parsed colormap:", colormap);
-            //console.log("Container attributes:", container.attributes);
-            
-            createVisualization(playerData, marketData, colormap);
-        };
-
-        new MutationObserver(updateVisualization).observe(container, {
-            attributes: true,
-            attributeFilter: ["data-player-data", "data-market-data", "data-colormap"]
+    function rowsFromColumns(columns) {
+        // The lineup store is column oriented: one array per field, one entry per player
+        const fields = Object.keys(columns || {});
+        const numRows = fields.length > 0 ? columns[fields[0]].length : 0;
+        return Array.from({length: numRows}, (_, i) => {
+            const row = {};
+            fields.forEach(field => { row[field] = columns[field][i]; });
+            return row;
         });
+    }
 
-        createVisualization([], [], {});
-        //console.log("Observer attached to d3-visualization-container.");
+    function renderLineup(lineup) {
+        const players = lineup ? rowsFromColumns(lineup.players) : [];
+        const colormap = lineup ? lineup.colormap : {};
+        // The market value bars annotate their rows, so they get copies
+        createVisualization(players, players.map(player => Object.assign({}, player)), colormap);
+        return window.dash_clientside.no_update;
     }
 
-    document.addEventListener("DOMContentLoaded", () => {
-        const checkContainerInterval = setInterval(function () {
-            const containerExists = document.getElementById('d3-visualization-container');
-            if (containerExists) {
-                attachObservers();
-                clearInterval(checkContainerInterval);
-            }
-        }, 100);
+    // Called by the clientside callback of components/player_lineup.py whenever the lineup store changes
+    window.dash_clientside = Object.assign({}, window.dash_clientside, {
+        lineup: {
+            render: renderLineup,
+        }
     });
 })();
 
@@ -5,7 +5,9 @@ import plotly.express as px
 from utils.consts import *
 from utils.utilsFunctions import *
 import plotly.graph_objects as go
+from functools import lru_cache
 from utils.tol_colors import tol_cset
+from utils.figure_cache import cached_figure
 
 clubs_value_component = dbc.Card(
     dbc.CardBody([
@@ -20,35 +22,24 @@ clubs_value_component = dbc.Card(
             ],
             value="all",
         ),
-        dcc.Store(id="club-stats-store"),
         dcc.Graph(id="clubs-value-graph")
     ]),
     className="m-2"
 )
 
 
-@callback(
-    [Output("clubs-value-graph", "figure"),
-     Output("club-stats-store", "data")],
-    [
-        Input("competition-dropdown", "value"),
-        Input("season-competition-dropdown", "value"),
-        Input("clubs-value-scope-dropdown", "value"),
-        Input("rankings-data-store", "data")
-    ]
-)
-def update_clubs_value_figure(selected_competition_id, selected_season, scope_value, rankings_data):
-    if selected_competition_id is None or selected_season is None or rankings_data is None:
-        return {}, []
-
-    # Convert rankings data back to DataFrame
-    ranking_df = pd.DataFrame(rankings_data)
+@lru_cache(maxsize=32)
+def calculate_club_value_stats(selected_competition_id, selected_season):
+    """
+    Aggregate the market value of every club in a competition and season, in total and per position, with one
+    groupby over (club, position). Cached, so switching the scope dropdown reuses the aggregate.
 
+    Returns:
+        tuple: DataFrame with 'club_id', 'club_name', 'total_value', 'club_size', one column per position and
+        'Rank', sorted by rank, and the list of positions. Callers must not modify the DataFrame.
+    """
     # Filter games based on selected competition and season
-    filtered_games = games_df[
-        (games_df["competition_id"] == selected_competition_id) &
-        (games_df["season"] == selected_season)
-        ]
+    filtered_games = get_games_by_competition_and_season(games_df, selected_competition_id, selected_season)
 
     game_ids = filtered_games['game_id'].unique()
 
@@ -74,47 +65,46 @@ def update_clubs_value_figure(selected_competition_id, selected_season, scope_va
     # Merge market values back into the player data
     player_data = player_data.merge(market_values, on="player_id", how="left")
 
-    # Initialize results list
-    results = []
-
-    # Process each club
-    for club_id in all_club_ids:
-        club_players = player_data[player_data['player_club_id'] == club_id]
-
-        # Calculate total market value
-        total_value = club_players['market_value_in_eur'].sum()
-
-        # Calculate club size (unique players)
-        club_size = club_players['player_id'].nunique()
-
-        # Calculate value by position
-        position_values = club_players.groupby('position')['market_value_in_eur'].sum().to_dict()
+    # Total value, squad size and value per position of all clubs at once
+    club_players = player_data.groupby('player_club_id')
+    position_values = player_data.groupby(['player_club_id', 'position'])['market_value_in_eur'].sum().unstack('position')
+    positions = list(position_values.columns)
 
-        # Get club name from clubs_df and apply shorthand
-        club_name = clubs_df[clubs_df['club_id'] == club_id]['name'].iloc[0] if not clubs_df[
-            clubs_df['club_id'] == club_id].empty else "Unknown"
-        club_name_shorthand = get_club_shorthand(club_name)
-
-        # Append to results
-        results.append({
-            'club_id': club_id,
-            'club_name': club_name_shorthand,
-            'total_value': total_value,
-            'club_size': club_size,
-            **position_values  # Add position-wise values as separate columns
-        })
-
-    # Convert results to a DataFrame
-    club_stats_df = pd.DataFrame(results)
+    club_stats_df = pd.DataFrame({
+        'club_id': all_club_ids,
+        'club_name': get_club_shorthands(all_club_ids),
+        'total_value': club_players['market_value_in_eur'].sum().reindex(all_club_ids, fill_value=0).to_numpy(),
+        'club_size': club_players['player_id'].nunique().reindex(all_club_ids, fill_value=0).to_numpy(),
+    })
+    club_stats_df = club_stats_df.join(position_values.reindex(all_club_ids).reset_index(drop=True))
 
+    ranking_df = get_standings(selected_competition_id, selected_season)
     club_stats_df = club_stats_df.merge(ranking_df[['club_id', 'Rank']], on='club_id', how='left')
 
     # Sort clubs by rank
     club_stats_df.sort_values(by='Rank', inplace=True)
+    return club_stats_df, positions
+
+
+@callback(
+    Output("clubs-value-graph", "figure"),
+    [
+        Input("competition-dropdown", "value"),
+        Input("season-competition-dropdown", "value"),
+        Input("clubs-value-scope-dropdown", "value")
+    ]
+)
+@cached_figure
+def update_clubs_value_figure(selected_competition_id, selected_season, scope_value):
+    if selected_competition_id is None or selected_season is None:
+        return {}
+
+    club_stats_df, positions = calculate_club_value_stats(selected_competition_id, selected_season)
+    club_stats_df = club_stats_df.copy()
 
     melted = club_stats_df.melt(
         id_vars=['club_name', 'club_id'],  # Include 'club_id' here
-        value_vars=position_values.keys(),
+        value_vars=positions,
         var_name='Position',
         value_name='Value'
     )
@@ -182,9 +172,9 @@ def update_clubs_value_figure(selected_competition_id, selected_season, scope_va
     )
     # Add total value as text above bars (optional for stacked bar chart)
     if scope_value == "all":
-        for i, club_name in enumerate(club_stats_df['club_name']):
-            total_value = club_stats_df.loc[club_stats_df['club_name'] == club_name, 'total_value'].values[0]
-            fig.add_annotation(
+        # All annotations in one layout update instead of one add_annotation call per club
+        fig.update_layout(annotations=[
+            dict(
                 x=club_name,
                 y=total_value,
                 text=f"{total_value / 1e6:.2f}M",
@@ -194,8 +184,10 @@ def update_clubs_value_figure(selected_competition_id, selected_season, scope_va
                 xanchor="center",
                 yanchor="bottom"
             )
+            for club_name, total_value in zip(club_stats_df['club_name'], club_stats_df['total_value'])
+        ])
 
-    return fig, club_stats_df.to_dict('records')
+    return fig
 
 
 @callback(
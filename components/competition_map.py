@@ -4,6 +4,7 @@ from utils.consts import *
 import pandas as pd
 import plotly.express as px
 from utils.utilsFunctions import get_competition_name
+from utils.figure_cache import cached_figure
 
 # Define ISO3 country codes
 countries = ["Denmark", "Spain", "France", "Italy", "Netherlands", "Portugal", "England", "Ukraine",
@@ -30,6 +31,7 @@ competition_map_component = dbc.Card(
     Output("competition-map", "figure"),
     Input("competition-dropdown", "value")
 )
+@cached_figure
 def update_competition_map(dropdown_value):
     # Initialize variables
     selected_competition_id = dropdown_value
@@ -1,12 +1,13 @@
 from dash import html, dcc, Input, Output, callback, dash_table
 import dash_bootstrap_components as dbc
 from utils.consts import *
+import pandas as pd
 import plotly.express as px
-from utils.utilsFunctions import get_club_shorthand
+from utils.utilsFunctions import get_standings, get_matchday_dates, get_standings_at
+from utils.figure_cache import cached_result
 
 competition_standing_component = dbc.Card(
     dbc.CardBody([
-        dcc.Store(id="rankings-data-store"),
         dash_table.DataTable(
             id='rankings-table',
             columns=[
@@ -23,81 +24,57 @@ competition_standing_component = dbc.Card(
             style_table={'overflowX': 'auto'},
             page_size=20
         ),
+        # Scrub through the season: the table after every matchday is precomputed, see utils.standings
+        html.Div(id="standings-matchday-label", className="mt-2"),
+        dcc.Slider(id="standings-matchday-slider", min=0, max=0, step=1, value=0, marks=None),
         # html.Div(id='selected-club-id', style={'margin-top': '10px'})
     ]),
     className="m-2"
 )
 
 
-def calculate_ranking(data):
-    # Create an empty dictionary to store team stats
-    teams_stats = {}
-
-    for _, row in data.iterrows():
-        # Home team stats
-        home_team = get_club_shorthand(row['home_club_name'])
-        away_team = get_club_shorthand(row['away_club_name'])
-        home_goals = row['home_club_goals']
-        away_goals = row['away_club_goals']
-        home_team_id = row['home_club_id']
-        away_team_id = row['away_club_id']
-
-        if home_team not in teams_stats:
-            teams_stats[home_team] = {'club_id': home_team_id, 'Wins': 0, 'Losses': 0, 'Draws': 0, 'GF': 0, 'GA': 0,
-                                      'Points': 0}
-        if away_team not in teams_stats:
-            teams_stats[away_team] = {'club_id': away_team_id, 'Wins': 0, 'Losses': 0, 'Draws': 0, 'GF': 0, 'GA': 0,
-                                      'Points': 0}
-
-        # Update goals for and against
-        teams_stats[home_team]['GF'] += home_goals
-        teams_stats[home_team]['GA'] += away_goals
-        teams_stats[away_team]['GF'] += away_goals
-        teams_stats[away_team]['GA'] += home_goals
-
-        # Update wins, losses, draws, and points
-        if home_goals > away_goals:
-            teams_stats[home_team]['Wins'] += 1
-            teams_stats[home_team]['Points'] += 3
-            teams_stats[away_team]['Losses'] += 1
-        elif home_goals < away_goals:
-            teams_stats[away_team]['Wins'] += 1
-            teams_stats[away_team]['Points'] += 3
-            teams_stats[home_team]['Losses'] += 1
-        else:
-            teams_stats[home_team]['Draws'] += 1
-            teams_stats[away_team]['Draws'] += 1
-            teams_stats[home_team]['Points'] += 1
-            teams_stats[away_team]['Points'] += 1
-
-    # Convert stats dictionary to a DataFrame
-    ranking_df = pd.DataFrame.from_dict(teams_stats, orient='index')
-    ranking_df.index.name = 'Team'
-    ranking_df.reset_index(inplace=True)
-    ranking_df['GD'] = ranking_df['GF'] - ranking_df['GA']
-    ranking_df.sort_values(by=['Points', 'GD', 'GF'], ascending=[False, False, False], inplace=True)
-    ranking_df.reset_index(drop=True, inplace=True)
-
-    # Add Rank column
-    ranking_df['Rank'] = ranking_df.index + 1
-    return ranking_df
-
-
-@callback([Output("rankings-table", "data"),
-           Output("rankings-data-store", "data")],
+@callback([Output("standings-matchday-slider", "max"),
+           Output("standings-matchday-slider", "marks"),
+           Output("standings-matchday-slider", "value")],
           [Input("competition-dropdown", "value"),
            Input("season-competition-dropdown", "value")]
           )
-def update_rankings(selected_competition_id, selected_season):
+def update_matchday_slider(selected_competition_id, selected_season):
     if selected_competition_id is None or selected_season is None:
-        return [], None
+        return 0, None, 0
 
-    filtered_games = games_df[
-        (games_df["competition_id"] == selected_competition_id) & (games_df["season"] == selected_season)]
+    # One step per matchday, the slider starts at the end of the season
+    last_matchday = max(len(get_matchday_dates(selected_competition_id, selected_season)) - 1, 0)
+    marks = {matchday: str(matchday + 1) for matchday in range(0, last_matchday + 1, 5)}
+    marks[last_matchday] = str(last_matchday + 1)
+    return last_matchday, marks, last_matchday
 
-    rankings = calculate_ranking(filtered_games)
 
-    return rankings.to_dict('records'), rankings.to_dict('records')
+@callback([Output("rankings-table", "data"),
+           Output("standings-matchday-label", "children")],
+          [Input("competition-dropdown", "value"),
+           Input("season-competition-dropdown", "value"),
+           Input("standings-matchday-slider", "value")]
+          )
+@cached_result
+def update_rankings(selected_competition_id, selected_season, selected_matchday):
+    if selected_competition_id is None or selected_season is None:
+        return [], ""
+
+    matchday_dates = get_matchday_dates(selected_competition_id, selected_season)
+    if len(matchday_dates) == 0:
+        return [], ""
+
+    # The final tables and the tables after every matchday are precomputed, see utils.standings
+    if selected_matchday is None or selected_matchday >= len(matchday_dates) - 1:
+        selected_matchday = len(matchday_dates) - 1
+        rankings = get_standings(selected_competition_id, selected_season)
+    else:
+        rankings = get_standings_at(selected_competition_id, selected_season, selected_matchday)
+
+    label = (f"Standings after matchday {selected_matchday + 1} of {len(matchday_dates)} "
+             f"({pd.Timestamp(matchday_dates[selected_matchday]).strftime('%Y-%m-%d')})")
+    return rankings.to_dict('records'), label
 
 
 # @callback(
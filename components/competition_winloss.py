@@ -1,10 +1,12 @@
 from dash import html, dcc, Input, Output, callback
 import dash_bootstrap_components as dbc
+import numpy as np
 import pandas as pd
 import plotly.express as px
 from utils.consts import *
-from utils.utilsFunctions import get_club_shorthand
+from utils.utilsFunctions import get_club_shorthand, get_standings, get_win_loss_summary
 from utils.tol_colors import tol_cset
+from utils.figure_cache import cached_figure
 
 # Card containing the figure
 win_loss_component = dbc.Card(
@@ -38,49 +40,22 @@ color_discrete_map = {
     [
         Input("competition-dropdown", "value"),
         Input("season-competition-dropdown", "value"),
-        Input("win-loss-scope-dropdown", "value"),
-        Input("rankings-data-store", "data")
+        Input("win-loss-scope-dropdown", "value")
     ]
 )
-def update_win_loss_figure(selected_competition_id, selected_season, scope, rankings_data):
-    if selected_competition_id is None or selected_season is None or rankings_data is None:
+@cached_figure
+def update_win_loss_figure(selected_competition_id, selected_season, scope):
+    if selected_competition_id is None or selected_season is None:
+        return {}
+
+    # Ranks of the precomputed league table
+    ranking_df = get_standings(selected_competition_id, selected_season)
+
+    # Wins, losses and draws per club are precomputed for every scope from the club-perspective games
+    summary = get_win_loss_summary(selected_competition_id, selected_season, scope)
+    if summary is None:
         return {}
 
-    # Convert rankings data back to DataFrame
-    ranking_df = pd.DataFrame(rankings_data)
-
-    filtered_games = games_df[
-        (games_df["competition_id"] == selected_competition_id) & (games_df["season"] == selected_season)
-        ]
-
-    # Initialize results list
-    results = []
-
-    for _, row in filtered_games.iterrows():
-        home_id = row['home_club_id']
-        away_id = row['away_club_id']
-        home_goals = row['home_club_goals']
-        away_goals = row['away_club_goals']
-
-        if scope in ["complete", "home"]:
-            if home_goals > away_goals:
-                results.append({'club_id': home_id, 'win': 1, 'loss': 0, 'draw': 0})
-            elif home_goals < away_goals:
-                results.append({'club_id': home_id, 'win': 0, 'loss': 1, 'draw': 0})
-            else:
-                results.append({'club_id': home_id, 'win': 0, 'loss': 0, 'draw': 1})
-
-        if scope in ["complete", "away"]:
-            if away_goals > home_goals:
-                results.append({'club_id': away_id, 'win': 1, 'loss': 0, 'draw': 0})
-            elif away_goals < home_goals:
-                results.append({'club_id': away_id, 'win': 0, 'loss': 1, 'draw': 0})
-            else:
-                results.append({'club_id': away_id, 'win': 0, 'loss': 0, 'draw': 1})
-
-    # Create a DataFrame from results and summarize
-    results_df = pd.DataFrame(results)
-    summary = results_df.groupby('club_id').sum().reset_index()
     title_map = {
         "complete": "Complete: Wins, Draws, and Losses by Club (Percentage)",
         "home": "Home: Wins, Draws, and Losses by Club (Percentage)",
@@ -125,11 +100,10 @@ def update_win_loss_figure(selected_competition_id, selected_season, scope, rank
     melted['Result'] = melted['Result'].map(result_display_map)
 
     # Add a column for dynamic display of "x out of y games"
-    melted['games_count'] = melted.apply(
-        lambda row: row['win_games'] if row['Result'] == 'win' else (
-            row['draw_games'] if row['Result'] == 'draw' else row['loss_games']
-        ),
-        axis=1
+    melted['games_count'] = np.select(
+        [melted['Result'] == 'win', melted['Result'] == 'draw'],
+        [melted['win_games'], melted['draw_games']],
+        default=melted['loss_games']
     )
 
     # Generate the figure
@@ -2,6 +2,7 @@ from dash import html, dcc, Input, Output, callback
 import dash_bootstrap_components as dbc
 from utils.consts import *
 import plotly.express as px
+from utils.figure_cache import cached_figure
 
 player_clubs_timeline_component = dbc.Card(
     dbc.CardBody([
@@ -15,6 +16,7 @@ player_clubs_timeline_component = dbc.Card(
     Output("clubs-timeline-graph", "figure"),
     Input("player-dropdown", "value")
 )
+@cached_figure
 def update_clubs_timeline(selected_player_id):
     if selected_player_id is None:
         return {}
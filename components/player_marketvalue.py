@@ -1,9 +1,11 @@
 from dash import html, dcc, Input, Output, callback
 import dash_bootstrap_components as dbc
 from plotly.graph_objs import Scatter
+import pandas as pd
 
 from utils.consts import *  # Ensure vibrant_colors is imported from this module
 import plotly.express as px
+from utils.figure_cache import cached_figure
 
 
 # Position color map
@@ -27,6 +29,7 @@ player_marketvalue_component = dbc.Card(
         Input('competition-dropdown', 'value'),
     ]
 )
+@cached_figure
 def update_valuation_graph(selected_player_id, selected_season_id, selected_competition_id):
     if selected_player_id is None:
         # Return an empty figure if no player is selected
@@ -43,10 +46,6 @@ def update_valuation_graph(selected_player_id, selected_season_id, selected_comp
     # Determine the line color based on the player's position
     line_color = get_position_color(player_position)
 
-    # Convert season start and end dates to datetime
-    seasons_df["start"] = pd.to_datetime(seasons_df["start"])
-    seasons_df["end"] = pd.to_datetime(seasons_df["end"])
-
     # Find the range of player valuation dates
     player_dates = pd.to_datetime(player_data["date"])
     valuation_start = player_dates.min()
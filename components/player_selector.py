@@ -1,6 +1,7 @@
 from dash import html, dcc, Input, Output, callback
 import dash_bootstrap_components as dbc
 from utils.consts import *
+from utils.utilsFunctions import get_team_context
 from datetime import datetime
 
 # Assuming players_df is already loaded
@@ -73,26 +74,12 @@ def update_player_details(player_id):
 @callback(
     Output("player-dropdown", "options"),
     [
-        Input("team-dropdown", "value"),
-        Input("competition-dropdown", "value"),
-        Input("season-competition-dropdown", "value")
+        Input("team-context-store", "data")
     ]
 )
-def filter_players_by_team(selected_team_id, selected_competition_id, selected_season):
-    if selected_team_id and selected_competition_id and selected_season:
-        relevant_games = games_df[
-            ((games_df['home_club_id'] == selected_team_id) | (games_df['away_club_id'] == selected_team_id)) &
-            (games_df['season'] == selected_season) &
-            (games_df['competition_id'] == selected_competition_id)
-            ]
-
-        relevant_game_ids = relevant_games['game_id'].unique()
-        relevant_appearances = appearances_df[
-            (appearances_df['game_id'].isin(relevant_game_ids)) &
-            (appearances_df['player_club_id'] == selected_team_id)
-            ]
-        relevant_player_ids = relevant_appearances['player_id'].unique()
-        filtered_players = players_df[players_df['player_id'].isin(relevant_player_ids)]
+def filter_players_by_team(team_context):
+    if team_context and team_context['season']:
+        filtered_players = get_team_context(**team_context)['players']
         player_options = [
             {"label": row["name"], "value": row["player_id"]} for _, row in filtered_players.iterrows()
         ]
@@ -1,16 +1,14 @@
 from dash import dcc, html, Input, Output, callback
 import plotly.express as px
-import pandas as pd
-from utils.utilsFunctions import load_team_games_data, get_club_shorthand
+from utils.utilsFunctions import load_team_games_data, get_club_shorthand, has_lineups
 from utils.consts import RESULT_COLORS
 import logging
 import plotly.graph_objects as go
 from utils.tol_colors import tol_cset  # cset for the categoricals cmap for continuous
+from utils.figure_cache import cached_figure
 
 logging.basicConfig(level=logging.INFO)
 
-game_lineups_df = pd.read_csv('data/game_lineups.csv')
-
 team_games_success_component = html.Div([
     html.Div([
         dcc.Graph(id='team-games-scatterplot', className="scatterplot"),
@@ -27,6 +25,7 @@ team_games_success_component = html.Div([
         Input("competition-dropdown", "value")
     ]
 )
+@cached_figure
 def update_team_games_scatterplot(team_id, selected_season, competition):
     team_games_df = load_team_games_data(team_id=team_id)
     team_games_df = team_games_df.sort_values('date')
@@ -42,7 +41,10 @@ def update_team_games_scatterplot(team_id, selected_season, competition):
         team_games_df = team_games_df[team_games_df['competition_id'] == competition]
 
     # Check if the game has a lineup - this variable we use later on to make the marker transparent
-    team_games_df['has_lineup'] = team_games_df['game_id'].isin(game_lineups_df['game_id'])
+    team_games_df['has_lineup'] = has_lineups(team_games_df['game_id'])
+
+    # The click handler splits the date string into day, month and year
+    team_games_df['date'] = team_games_df['date'].dt.strftime('%Y-%m-%d')
 
     # Home/Away mapping
     team_games_df['game_type'] = team_games_df['home_away'].map({'Home': 'H', 'Away': 'A'})
@@ -1,9 +1,10 @@
-from dash import dcc, Input, Output, callback, html
+from dash import dcc, Input, Output, State, callback, clientside_callback, ClientsideFunction, html
 import dash_bootstrap_components as dbc
 from utils.consts import *
 from utils.utilsFunctions import *
 from utils.tol_colors import tol_cset
 import plotly.graph_objects as go
+from utils.figure_cache import cached_figure
 
 team_market_value_bar_chart_component = dbc.Card(
     dbc.CardBody([
@@ -17,44 +18,20 @@ team_market_value_bar_chart_component = dbc.Card(
 @callback(
     Output('team-market-value-bar-chart', 'figure'),
     [
-        Input('team-dropdown', 'value'),
-        Input("season-competition-dropdown", "value"),
-        Input('competition-dropdown', 'value'),
+        Input('team-context-store', 'data'),
         Input('treemap-store', 'data'),
-        Input('clicked-player-store', 'data')
-    ]
+    ],
+    # Clicks are highlighted clientside, see below. A new figure highlights the player that is clicked already.
+    State('clicked-player-store', 'data')
 )
-def update_market_value_bar_chart(selected_team, selected_season, selected_competition, treemap_data, clicked_player_id):
-    if selected_team is None:
+@cached_figure
+def update_market_value_bar_chart(team_context, treemap_data, clicked_player_id):
+    if team_context is None:
         return {}
+    selected_season = team_context['season']
 
-    # Filter games for the selected team and season
-    relevant_games = games_df[
-        ((games_df['home_club_id'] == selected_team) | (games_df['away_club_id'] == selected_team)) &
-        (games_df['season'] == selected_season) &
-        (games_df['competition_id'] == selected_competition)
-        ]
-
-    # Extract game IDs for the filtered games
-    relevant_game_ids = relevant_games['game_id'].unique()
-
-    # Use `appearances_df` to find players who appeared in these games for the selected team
-    relevant_appearances = appearances_df[
-        (appearances_df['game_id'].isin(relevant_game_ids)) &
-        (appearances_df['player_club_id'] == selected_team)
-        ]
-
-    # Get unique player IDs for the filtered appearances
-    relevant_player_ids = relevant_appearances['player_id'].unique()
-
-    # Filter `players_df` for these player IDs
-    team_players = players_df[players_df['player_id'].isin(relevant_player_ids)]
-
-    evaluation = get_player_market_value_by_season(team_players, selected_season, selected_competition)
-    evaluation = evaluation.rename(columns={'market_value_in_eur': 'current_market_value_in_eur'})
-    team_players = team_players.merge(evaluation, on='player_id', how='left')
-    team_players = team_players[team_players['current_market_value_in_eur'].notna()]
-    team_players['player_label'] = generate_player_label(team_players)
+    # Players of the selected team with a market value in the season and competition
+    team_players = get_valued_team_players(team_context)
 
     # Filter based on the treemap path (if applicable)
     path = treemap_data['path']
@@ -109,6 +86,17 @@ def update_market_value_bar_chart(selected_team, selected_season, selected_compe
 
     return fig
 
+
+# A click on a player only changes the marker opacity, which is done in the browser (assets/player_highlight.js)
+clientside_callback(
+    ClientsideFunction(namespace='highlight', function_name='marketValueBarChart'),
+    Output('team-market-value-bar-chart', 'figure', allow_duplicate=True),
+    Input('clicked-player-store', 'data'),
+    State('team-market-value-bar-chart', 'figure'),
+    prevent_initial_call=True
+)
+
+
 @callback(
     Output('clicked-player-store', 'data'),
     Input('team-market-value-bar-chart', 'clickData')
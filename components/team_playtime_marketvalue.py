@@ -1,8 +1,9 @@
-from dash import dcc, Input, Output, callback, html
+from dash import dcc, Input, Output, State, callback, clientside_callback, ClientsideFunction, html
 import dash_bootstrap_components as dbc
 import plotly.graph_objects as go
 from utils.consts import *
 from utils.utilsFunctions import *
+from utils.figure_cache import cached_figure
 
 team_playtime_marketvalue_component = dbc.Card(
     dbc.CardBody([
@@ -27,50 +28,20 @@ def update_clicked_player(click_data):
 
 @callback(
     Output('team-playtime-marketvalue-scatter-chart', 'figure'),
-    Input('team-dropdown', 'value'),
-    Input('season-competition-dropdown', 'value'),
-    Input('competition-dropdown', 'value'),
+    Input('team-context-store', 'data'),
     Input('treemap-store', 'data'),
-    Input('clicked-player-store', 'data'),
-
+    # Clicks are highlighted clientside, see below. A new figure highlights the player that is clicked already.
+    State('clicked-player-store', 'data'),
 )
-def update_playtime_marketvalue(selected_team, selected_season, selected_competition, treemap_data, clicked_player_id):
-    if selected_team is None:
+@cached_figure
+def update_playtime_marketvalue(team_context, treemap_data, clicked_player_id):
+    if team_context is None:
         return {}
+    selected_season = team_context['season']
+    selected_competition = team_context['competition_id']
 
-    relevant_games = games_df[
-        ((games_df['home_club_id'] == selected_team) | (games_df['away_club_id'] == selected_team)) &
-        (games_df['season'] == selected_season) & (games_df['competition_id'] == selected_competition)
-        ]
-
-    relevant_game_ids = relevant_games['game_id'].unique()
-
-    relevant_appearances = appearances_df[
-        (appearances_df['game_id'].isin(relevant_game_ids)) &
-        (appearances_df['player_club_id'] == selected_team)
-        ]
-
-    relevant_appearances.loc[:, 'minutes_played'] = pd.to_numeric(relevant_appearances['minutes_played'],
-                                                                  errors='coerce').fillna(0)
-
-    relevant_appearances = relevant_appearances.groupby('player_id').agg(
-        minutes_played=pd.NamedAgg(column='minutes_played', aggfunc='sum'),
-        goals=pd.NamedAgg(column='goals', aggfunc='sum'),
-        assists=pd.NamedAgg(column='assists', aggfunc='sum'),
-        yellow_cards=pd.NamedAgg(column='yellow_cards', aggfunc='sum'),
-        red_cards=pd.NamedAgg(column='red_cards', aggfunc='sum'),
-        total_games=pd.NamedAgg(column='game_id', aggfunc='count')
-    ).reset_index()
-
-    relevant_player_ids = relevant_appearances['player_id'].unique()
-    team_players = players_df[players_df['player_id'].isin(relevant_player_ids)]
-
-    evaluation = get_player_market_value_by_season(team_players, selected_season, selected_competition)
-    evaluation = evaluation.rename(columns={'market_value_in_eur': 'current_market_value_in_eur'})
-    team_players = team_players.merge(evaluation, on='player_id', how='left')
-    team_players = team_players[team_players['current_market_value_in_eur'].notna()]
-
-    team_players = team_players.merge(relevant_appearances, on='player_id', how='left')
+    # Players of the team with a market value, with their minutes, goals, assists, cards and games
+    team_players = get_valued_team_players(team_context)
 
     path = treemap_data['path']
     if path:
@@ -185,3 +156,13 @@ def update_playtime_marketvalue(selected_team, selected_season, selected_competi
     )
 
     return fig
+
+
+# A click on a player only changes the marker opacity, which is done in the browser (assets/player_highlight.js)
+clientside_callback(
+    ClientsideFunction(namespace='highlight', function_name='playtimeMarketValue'),
+    Output('team-playtime-marketvalue-scatter-chart', 'figure', allow_duplicate=True),
+    Input('clicked-player-store', 'data'),
+    State('team-playtime-marketvalue-scatter-chart', 'figure'),
+    prevent_initial_call=True
+)
@@ -34,6 +34,8 @@ team_selector_component = dbc.Card(
                 )
             ]),
         ]),
+        # Selection of the team charts, their shared data is computed once by get_team_context
+        dcc.Store(id='team-context-store', data=None),
     ]),
     className="m-2"
 )
@@ -55,6 +57,25 @@ def update_team_info(selected_team_id):
     return image_src, {'path': [], 'player_id': None}
 
 
+@callback(
+    Output('team-context-store', 'data'),
+    Input('team-dropdown', 'value'),
+    Input('season-competition-dropdown', 'value'),
+    Input('competition-dropdown', 'value'),
+)
+def update_team_context(selected_team_id, selected_season, selected_competition_id):
+    context_key = team_context_key(selected_team_id, selected_season, selected_competition_id)
+    if context_key is not None:
+        # Compute the shared data before the team charts ask for it
+        try:
+            get_team_context(**context_key)
+        except ValueError as e:
+            # E.g. a squad without valuations in the season, the team charts stay empty
+            print(f"Error computing the team context of {context_key}: {e}")
+            return None
+    return context_key
+
+
 @callback(
     Output("team-dropdown", "options"),
     [
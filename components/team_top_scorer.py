@@ -1,9 +1,10 @@
-from dash import html, dcc, Input, Output, callback
+from dash import html, dcc, Input, Output, State, callback, clientside_callback, ClientsideFunction
 import dash_bootstrap_components as dbc
 import plotly.graph_objects as go
 
 from utils.consts import *
 from utils.utilsFunctions import *
+from utils.figure_cache import cached_figure
 
 team_top_scorers_component = dbc.Card(
     dbc.CardBody([
@@ -23,45 +24,24 @@ team_top_scorers_component = dbc.Card(
     className="m-2"
 )
 
-# Merge appearances_df with games_df to include the season column
-merged_df = appearances_df.merge(games_df[['game_id', 'season']], on='game_id', how='left')
-
-
 @callback(
     Output('top-scorers-assists-graph', 'figure'),
     [
-        Input('team-dropdown', 'value'),
-        Input('season-competition-dropdown', 'value'),
-        Input('competition-dropdown', 'value'),
+        Input('team-context-store', 'data'),
         Input('scorer-chart-mode-dropdown', 'value'),
         Input('treemap-store', 'data'),
-        Input('clicked-player-store', 'data')
-    ]
+    ],
+    # Clicks are highlighted clientside, see below. A new figure highlights the player that is clicked already.
+    State('clicked-player-store', 'data')
 )
-def update_top_scorers_graph(selected_team, selected_season, selected_competition, chart_mode, treemap_data,
-                             clicked_player_id):
-    if not selected_team:
+@cached_figure
+def update_top_scorers_graph(team_context, chart_mode, treemap_data, clicked_player_id):
+    if not team_context:
         return {}
+    selected_season = team_context['season']
 
-    # Filter data for selected team, season, and competition
-    relevant_games = games_df[
-        ((games_df['home_club_id'] == selected_team) | (games_df['away_club_id'] == selected_team)) &
-        (games_df['season'] == selected_season) & (games_df['competition_id'] == selected_competition)
-        ]
-
-    relevant_game_ids = relevant_games['game_id'].unique()
-
-    relevant_appearances = appearances_df[
-        (appearances_df['game_id'].isin(relevant_game_ids)) &
-        (appearances_df['player_club_id'] == selected_team)
-        ]
-
-    # Aggregate goals and assists
-    scorer_data = relevant_appearances.groupby('player_id').agg(
-        goals=pd.NamedAgg(column='goals', aggfunc='sum'),
-        assists=pd.NamedAgg(column='assists', aggfunc='sum'),
-        minutes_played=pd.NamedAgg(column='minutes_played', aggfunc='sum')
-    ).reset_index()
+    # Goals, assists and minutes of every player of the team in the season and competition
+    scorer_data = get_team_context(**team_context)['squad'][['player_id', 'goals', 'assists', 'minutes_played']].copy()
 
     # Calculate metrics
     scorer_data['scorer_points'] = scorer_data['goals'] + scorer_data['assists']
@@ -209,6 +189,16 @@ def update_top_scorers_graph(selected_team, selected_season, selected_competitio
     return fig
 
 
+# A click on a player only changes the marker opacity, which is done in the browser (assets/player_highlight.js)
+clientside_callback(
+    ClientsideFunction(namespace='highlight', function_name='topScorers'),
+    Output('top-scorers-assists-graph', 'figure', allow_duplicate=True),
+    Input('clicked-player-store', 'data'),
+    State('top-scorers-assists-graph', 'figure'),
+    prevent_initial_call=True
+)
+
+
 @callback(
     Output('clicked-player-store', 'data', allow_duplicate=True),
     Input('top-scorers-assists-graph', 'clickData'),
@@ -3,6 +3,7 @@ import dash_bootstrap_components as dbc
 import plotly.express as px
 from utils.consts import *
 from utils.utilsFunctions import *
+from utils.figure_cache import cached_figure
 
 # Include a Store for tracking path state
 treemap_store = dcc.Store(id="treemap-store", data={'path': [], 'player_id': None})
@@ -18,39 +19,15 @@ team_treemap = dbc.Card(
 
 @callback(
     Output('team-market-value-treemap', 'figure'),
-    Input('team-dropdown', 'value'),
-    Input('season-competition-dropdown', 'value'),
-    Input('competition-dropdown', 'value'),
+    Input('team-context-store', 'data'),
 )
-def update_team_treemap_chart(selected_team, selected_season, selected_competition):
-    if selected_team is None:
+@cached_figure
+def update_team_treemap_chart(team_context):
+    if team_context is None:
         return {}
 
-    # Filter `games_df` for the selected team and season
-    relevant_games = games_df[
-        ((games_df['home_club_id'] == selected_team) | (games_df['away_club_id'] == selected_team)) &
-        (games_df['season'] == selected_season) &
-        (games_df['competition_id'] == selected_competition)
-        ]
-
-    # Extract game IDs for the filtered games
-    relevant_game_ids = relevant_games['game_id'].unique()
-
-    # Use `appearances_df` to find players who appeared in these games for the selected team
-    relevant_appearances = appearances_df[
-        (appearances_df['game_id'].isin(relevant_game_ids)) &
-        (appearances_df['player_club_id'] == selected_team)
-        ]
-
-    relevant_player_ids = relevant_appearances['player_id'].unique()
-
-    team_players = players_df[players_df['player_id'].isin(relevant_player_ids)]
-
-    evaluation = get_player_market_value_by_season(team_players, selected_season, selected_competition)
-    evaluation = evaluation.rename(columns={'market_value_in_eur': 'current_market_value_in_eur'})
-    team_players = team_players.merge(evaluation, on='player_id', how='left')
-    team_players = team_players[team_players['current_market_value_in_eur'].notna()]
-    team_players['player_label'] = generate_player_label(team_players)
+    # Players of the selected team with a market value in the season and competition
+    team_players = get_valued_team_players(team_context)
 
     # Calculate market value percentages
     team_total_value = team_players['current_market_value_in_eur'].sum()
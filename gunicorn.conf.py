@@ -0,0 +1,32 @@
+import gc
+import os
+from utils.memory_report import format_memory_report
+
+# Serving mode: the tables are memory mapped from the feather cache (see utils/tables.py) and loaded once in the
+# master process. The workers are forked afterwards and share those pages instead of holding their own copies.
+os.environ.setdefault("FOOTBALLVIS_MEMORY_MAP", "1")
+# The workers share one figure cache on disk (see utils/figure_cache.py), a figure rendered by one of them is a hit
+# for all others
+os.environ.setdefault("FOOTBALLVIS_FIGURE_CACHE", "disk")
+
+bind = "0.0.0.0:8080"
+workers = int(os.environ.get("WEB_CONCURRENCY", 4))
+preload_app = True
+
+
+def when_ready(server):
+    # Exclude everything allocated while preloading from garbage collection, otherwise the first collection in
+    # every worker writes to the shared objects and thereby copies their pages
+    gc.freeze()
+    server.log.info(format_memory_report("master"))
+
+
+def post_worker_init(worker):
+    worker.log.info(format_memory_report(f"worker {worker.pid} started"))
+
+
+def worker_exit(server, worker):
+    # Imported here, the module reads its environment variables when it is imported
+    from utils.figure_cache import format_cache_stats
+    server.log.info(format_memory_report(f"worker {worker.pid} exiting"))
+    server.log.info(format_cache_stats(f"worker {worker.pid}"))
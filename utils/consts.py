@@ -1,41 +1,61 @@
-import pandas as pd
 import plotly.express as px
 from utils.tol_colors import tol_cset
+from utils.tables import data_folder, memory_map_tables, read_cached_table, read_csv_table
 import os
+import time
+
+# Load time and memory footprint of every loaded table, filled by load_table
+table_load_stats = {}
+
+
+def load_table(name):
+    """
+    Load a single table of the catalog and record how long it took and how much memory the resulting DataFrame
+    occupies. The typed columnar copy built by utils.tables is preferred, the CSV file is the fallback.
+    """
+    start = time.perf_counter()
+    df = read_cached_table(name)
+    source = "mmap" if memory_map_tables else "feather"
+    if df is None:
+        df = read_csv_table(name)
+        source = "csv"
+    table_load_stats[name] = {
+        "source": source,
+        "rows": len(df),
+        "seconds": time.perf_counter() - start,
+        "memory_mb": df.memory_usage(deep=True).sum() / 1024 ** 2,
+    }
+    return df
+
+
+def print_load_report():
+    """
+    Print the load time and memory footprint per table, largest tables first.
+    """
+    print(f"{'table':<20}{'source':>8}{'rows':>12}{'load (s)':>12}{'memory (MB)':>14}")
+    for name, stats in sorted(table_load_stats.items(), key=lambda item: item[1]["memory_mb"], reverse=True):
+        print(f"{name:<20}{stats['source']:>8}{stats['rows']:>12}{stats['seconds']:>12.2f}{stats['memory_mb']:>14.1f}")
+    total_seconds = sum(stats["seconds"] for stats in table_load_stats.values())
+    total_memory = sum(stats["memory_mb"] for stats in table_load_stats.values())
+    print(f"{'total':<20}{'':>8}{'':>12}{total_seconds:>12.2f}{total_memory:>14.1f}")
 
-# Set the correct root directory for your project
-base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))  # Adjust as needed
-data_folder = os.path.join(base_dir, 'data')
-
-# Define the paths to all CSV files
-files = {
-    "appearances": os.path.join(data_folder, 'appearances.csv'),
-    "clubGames": os.path.join(data_folder, 'club_games.csv'),
-    "clubs": os.path.join(data_folder, 'clubs.csv'),
-    "competitions": os.path.join(data_folder, 'competitions.csv'),
-    "gameEvents": os.path.join(data_folder, 'game_events.csv'),
-    "gameLineups": os.path.join(data_folder, 'game_lineups.csv'),
-    "games": os.path.join(data_folder, 'games.csv'),
-    "player_valuations": os.path.join(data_folder, 'player_valuations.csv'),
-    "players": os.path.join(data_folder, 'players.csv'),
-    "transfers": os.path.join(data_folder, 'transfers.csv'),
-    "seasons": os.path.join(data_folder, 'seasons.csv'),
-}
 
-# Load the DataFrames
+# Load the DataFrames. This is the only place the tables are loaded, every component imports them from here.
 try:
-    appearances_df = pd.read_csv(files["appearances"])
-    clubGames_df = pd.read_csv(files["clubGames"])
-    clubs_df = pd.read_csv(files["clubs"])
-    competitions_df = pd.read_csv(files["competitions"])
-    gameEvents_df = pd.read_csv(files["gameEvents"])
-    gameLineups_df = pd.read_csv(files["gameLineups"])
-    games_df = pd.read_csv(files["games"])
-    player_valuations_df = pd.read_csv(files["player_valuations"])
-    players_df = pd.read_csv(files["players"])
-    transfers_df = pd.read_csv(files["transfers"])
-    seasons_df = pd.read_csv(files["seasons"])
+    appearances_df = load_table("appearances")
+    clubGames_df = load_table("clubGames")
+    clubs_df = load_table("clubs")
+    competitions_df = load_table("competitions")
+    gameEvents_df = load_table("gameEvents")
+    gameLineups_df = load_table("gameLineups")
+    games_df = load_table("games")
+    player_valuations_df = load_table("player_valuations")
+    players_df = load_table("players")
+    transfers_df = load_table("transfers")
+    seasons_df = load_table("seasons")
+    standings_df = load_table("standings")
     print("All files loaded successfully!")
+    print_load_report()
 except FileNotFoundError as e:
     print(f"Error loading file: {e}")
     print(f"Contents of 'data/' directory: {os.listdir(data_folder) if os.path.exists(data_folder) else 'Data folder not found'}")
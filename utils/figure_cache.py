@@ -0,0 +1,247 @@
+import functools
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import shutil
+import sys
+import threading
+from collections import OrderedDict
+from utils.tables import cache_folder, cached_checksum
+
+# Backend of the figure cache: "memory" keeps the figures in the process, "disk" in files all gunicorn workers share
+# (gunicorn.conf.py selects it) and "off" disables the cache.
+figure_cache_backend = os.environ.get("FOOTBALLVIS_FIGURE_CACHE", "memory")
+# Memory budget of the cache in MB, per process for the memory backend and in total for the disk backend
+figure_cache_budget = int(float(os.environ.get("FOOTBALLVIS_FIGURE_CACHE_MB", 256)) * 1024 ** 2)
+
+figure_cache_folder = os.path.join(cache_folder, 'figures')
+# The disk backend scans its folder once the figures written since the last scan exceed this share of the budget,
+# and then deletes figures until the folder is below 1 - this share of the budget
+disk_evict_fraction = 0.1
+
+
+def serialize_figure(value):
+    """
+    Pickle the result of a figure callback. Figures are stored as their plotly JSON, which Dash accepts as well and
+    which loads without validating every property again.
+    """
+    if isinstance(value, tuple):
+        value = tuple(item.to_plotly_json() if hasattr(item, 'to_plotly_json') else item for item in value)
+    elif hasattr(value, 'to_plotly_json'):
+        value = value.to_plotly_json()
+    return pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+class MemoryBackend:
+    """
+    Figures of this process in least recently used order, evicted once they exceed the budget.
+    """
+
+    def __init__(self, budget):
+        self.budget = budget
+        self.size = 0
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            data = self.entries.get(key)
+            if data is not None:
+                self.entries.move_to_end(key)
+            return data
+
+    def set(self, key, data):
+        if len(data) > self.budget:
+            return
+        with self.lock:
+            if key in self.entries:
+                self.size -= len(self.entries.pop(key))
+            self.entries[key] = data
+            self.size += len(data)
+            while self.size > self.budget:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+
+class DiskBackend:
+    """
+    Figures as files in a folder per dataset, shared by all processes. The modification time of a file is its last
+    use, the least recently used files are deleted once a scan of the folder finds it over the budget.
+    """
+
+    def __init__(self, folder, budget):
+        self.folder = folder
+        self.budget = budget
+        os.makedirs(self.folder, exist_ok=True)
+        # Size of the folder at the last scan plus the figures this process wrote since. Other workers write to the
+        # folder as well, so the folder is scanned again after every disk_evict_fraction of the budget written.
+        self.size = 0
+        self.written = 0
+        self.lock = threading.Lock()
+        self.evict()
+
+    def get(self, key):
+        path = os.path.join(self.folder, key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            os.utime(path)
+        except FileNotFoundError:
+            # Not cached yet, or evicted by another worker in the meantime
+            return None
+        return data
+
+    def set(self, key, data):
+        if len(data) > self.budget:
+            return
+        # Write to a temporary file first, the other workers must never read a half written figure
+        path = os.path.join(self.folder, key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        with self.lock:
+            self.size += len(data)
+            self.written += len(data)
+            if self.size <= self.budget and self.written <= self.budget * disk_evict_fraction:
+                return
+        self.evict()
+
+    def evict(self):
+        """
+        Scan the folder and delete the least recently used figures once it exceeds the budget.
+        """
+        entries = []
+        for entry in os.scandir(self.folder):
+            if entry.name.endswith('.tmp'):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        size = sum(entry_size for _, entry_size, _ in entries)
+        if size > self.budget:
+            for _, entry_size, path in sorted(entries):
+                if size <= self.budget * (1 - disk_evict_fraction):
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                size -= entry_size
+        with self.lock:
+            self.size = size
+            self.written = 0
+
+    def clear(self):
+        shutil.rmtree(self.folder, ignore_errors=True)
+        os.makedirs(self.folder, exist_ok=True)
+        with self.lock:
+            self.size = 0
+            self.written = 0
+
+
+def create_backend(name=figure_cache_backend, budget=figure_cache_budget):
+    """
+    Create the backend of the figure cache, or None if the cache is disabled.
+    """
+    if name == "off":
+        return None
+    if name == "memory":
+        return MemoryBackend(budget)
+    if name == "disk":
+        # A new dump gets a new folder, the figures of the previous one are deleted
+        dataset = (cached_checksum() or "csv")[:16]
+        if os.path.isdir(figure_cache_folder):
+            for entry in os.scandir(figure_cache_folder):
+                if entry.name != dataset:
+                    shutil.rmtree(entry.path, ignore_errors=True)
+        return DiskBackend(os.path.join(figure_cache_folder, dataset), budget)
+    raise ValueError(f"Unknown figure cache backend '{name}', supported are 'memory', 'disk' and 'off'.")
+
+
+def helpers_version():
+    """
+    Checksum over the sources of the shared helper modules in utils/, which every cached function depends on.
+    """
+    digest = hashlib.sha256()
+    utils_folder = os.path.dirname(os.path.abspath(__file__))
+    for name in sorted(os.listdir(utils_folder)):
+        if name.endswith('.py'):
+            with open(os.path.join(utils_folder, name), 'rb') as f:
+                digest.update(f.read())
+    return digest.hexdigest()
+
+
+backend = create_backend()
+# Changing a helper, e.g. utils/utilsFunctions.py or utils/standings.py, invalidates all cached results
+helpers_checksum = helpers_version()[:16]
+# Hits and misses of this process per callback
+cache_stats = {}
+
+
+def cached_result(func):
+    """
+    Cache the results of a function by its arguments, in the backend of the figure cache. The function must only
+    depend on its arguments and the loaded tables, and its results must be picklable. The cache key contains the
+    source of the function's module and of the helper modules in utils/, so changing them invalidates its results.
+    """
+    name = f"{func.__module__}.{func.__qualname__}"
+    with open(inspect.getsourcefile(func), 'rb') as f:
+        version = f"{hashlib.sha256(f.read()).hexdigest()[:16]}:{helpers_checksum}"
+    stats = cache_stats.setdefault(name, {"hits": 0, "misses": 0})
+    signature = inspect.signature(func)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if backend is None:
+            return func(*args, **kwargs)
+
+        # Keyword arguments get the same key as the same arguments passed by position
+        arguments = json.dumps(list(signature.bind(*args, **kwargs).arguments.values()), sort_keys=True, default=str)
+        key = hashlib.sha256(f"{name}:{version}:{arguments}".encode()).hexdigest()
+        data = backend.get(key)
+        if data is not None:
+            stats["hits"] += 1
+            return pickle.loads(data)
+
+        stats["misses"] += 1
+        value = func(*args, **kwargs)
+        backend.set(key, serialize_figure(value))
+        return value
+
+    return wrapper
+
+
+def cached_figure(func):
+    """
+    Cache the figures of a figure callback by its arguments, see cached_result. Place it below @callback, so Dash
+    registers the cached function.
+    """
+    return cached_result(func)
+
+
+def format_cache_stats(label):
+    """
+    Format the hits and misses of the figure cache in this process as a single log line.
+    """
+    hits = sum(stats["hits"] for stats in cache_stats.values())
+    misses = sum(stats["misses"] for stats in cache_stats.values())
+    requests = hits + misses
+    hit_rate = f"{hits / requests:.0%}" if requests else "n/a"
+    return f"{label}: figure cache ({figure_cache_backend}) {hits} hits, {misses} misses, hit rate {hit_rate}"
+
+
+if __name__ == "__main__":
+    if "--clear" in sys.argv:
+        shutil.rmtree(figure_cache_folder, ignore_errors=True)
+        print(f"Cleared the figure cache in '{figure_cache_folder}'.")
@@ -0,0 +1,39 @@
+import os
+
+
+def process_memory(pid="self"):
+    """
+    Return the resident memory of a process split into bytes shared with other processes (the preloaded and
+    memory mapped tables) and bytes private to it, read from /proc/<pid>/smaps_rollup.
+    Returns None where that file is not available, e.g. outside of Linux.
+    """
+    path = f"/proc/{pid}/smaps_rollup"
+    if not os.path.exists(path):
+        return None
+
+    fields = {}
+    with open(path) as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1]) * 1024
+
+    return {
+        "rss": fields.get("Rss", 0),
+        "pss": fields.get("Pss", 0),
+        "shared": fields.get("Shared_Clean", 0) + fields.get("Shared_Dirty", 0),
+        "private": fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0),
+    }
+
+
+def format_memory_report(label, pid="self"):
+    """
+    Format the shared and private memory of a process as a single log line.
+    """
+    memory = process_memory(pid)
+    if memory is None:
+        return f"{label}: memory report is not available on this platform"
+
+    mb = 1024 ** 2
+    return (f"{label}: rss {memory['rss'] / mb:.1f} MB, shared {memory['shared'] / mb:.1f} MB, "
+            f"private {memory['private'] / mb:.1f} MB, pss {memory['pss'] / mb:.1f} MB")
@@ -1,87 +1,319 @@
 import pandas as pd
 import numpy as np
 import os
-import math
+import sys
+import tempfile
+from utils.tables import data_folder, read_csv_table
 
 # Adjust these parameters as needed
-CHUNK_SIZE = 5000  # Number of players to process before writing partial results and printing progress
-
-# Load data once
-print("Loading data...")
-games_df = pd.read_csv('data/games.csv')
-lineups_df = pd.read_csv('data/game_lineups.csv')
-
-print("Merging data...")
-# Merge datasets
-merged_df = lineups_df.merge(
-    games_df[["game_id", "home_club_id", "away_club_id", "home_club_goals", "away_club_goals"]],
-    on="game_id",
-    how="inner"
-)
-
-print("Calculating points vectorized...")
-# Vectorized calculation of points
-conditions = [
-    (merged_df["club_id"] == merged_df["home_club_id"]) & (merged_df["home_club_goals"] > merged_df["away_club_goals"]),
-    (merged_df["club_id"] == merged_df["home_club_id"]) & (merged_df["home_club_goals"] == merged_df["away_club_goals"]),
-    (merged_df["club_id"] == merged_df["away_club_id"]) & (merged_df["away_club_goals"] > merged_df["home_club_goals"]),
-    (merged_df["club_id"] == merged_df["away_club_id"]) & (merged_df["away_club_goals"] == merged_df["home_club_goals"])
-]
-choices = [3, 1, 3, 1]
-merged_df["points"] = np.select(conditions, choices, default=0)
-
-print("Extracting unique players...")
-all_players = merged_df["player_id"].unique()
-total_players = len(all_players)
-print(f"Found {total_players} unique players.")
-
-# Sort players to have a deterministic order (not strictly needed, but good for clarity)
-all_players.sort()
+CHUNK_SIZE = 5000  # Number of games to fold in before writing a checkpoint and printing progress
+FORM_GAMES = 5  # Number of previous games the form of a player is averaged over
 
 # Prepare output paths
-final_output_path = 'data/player_gpas.csv'
-partial_output_path = 'data/player_gpas_partial.csv'
-
-# If partial file exists from a previous run, optionally you can load it and skip processed players.
-# For now, we always start fresh.
-if os.path.exists(partial_output_path):
-    os.remove(partial_output_path)
-
-# We'll process players in chunks
-num_chunks = math.ceil(total_players / CHUNK_SIZE)
-
-print(f"Starting GPA computation in {num_chunks} chunks of up to {CHUNK_SIZE} players each...")
-
-# We'll need a DataFrame to accumulate results if you want to write in chunks
-# But writing directly in chunks might be more memory-friendly
-# We'll just compute and write chunk by chunk
-for i in range(num_chunks):
-    start_idx = i * CHUNK_SIZE
-    end_idx = min(start_idx + CHUNK_SIZE, total_players)
-    player_subset = all_players[start_idx:end_idx]
-
-    # Filter merged_df for these players
-    subset_df = merged_df[merged_df["player_id"].isin(player_subset)]
-
-    # Group by player_id and calculate mean points
-    gpa_chunk = subset_df.groupby("player_id")["points"].mean().reset_index(name="gpa")
-
-    # Append to partial file
-    if i == 0:
-        # Write header for the first time
-        gpa_chunk.to_csv(partial_output_path, index=False, mode='w')
-    else:
-        # Append to existing file
-        gpa_chunk.to_csv(partial_output_path, index=False, mode='a', header=False)
-
-    print(f"Chunk {i+1}/{num_chunks} processed and saved. ({end_idx}/{total_players} players done)")
-
-print("All chunks processed. Reading partial results to create final output...")
-# Now read partial results and combine (if needed, they should already be combined)
-final_gpa_df = pd.read_csv(partial_output_path)
-# Ensure uniqueness if needed (there should be no duplicates if no interruptions)
-final_gpa_df = final_gpa_df.drop_duplicates("player_id")
-
-# Write final results
-final_gpa_df.to_csv(final_output_path, index=False)
-print(f"GPA calculations completed and saved to '{final_output_path}'.")
+final_output_path = os.path.join(data_folder, 'player_gpas.csv')
+season_output_path = os.path.join(data_folder, 'player_season_gpas.csv')
+form_output_path = os.path.join(data_folder, 'player_form.npz')
+# Points sum and game count per player and per (player, season, competition), the points of every lineup entry and
+# the games they already contain. Written once a run completes, so a new dump only adds the points of its new games.
+state_path = os.path.join(data_folder, 'player_gpas_state.npz')
+# Checkpoints of a run: the points of every folded chunk, so an interrupted run resumes where it stopped without
+# rewriting the whole state after every chunk. They are merged into the state once the run completes.
+checkpoint_folder = os.path.join(data_folder, 'player_gpas_checkpoints')
+
+# Form keys combine game and player, so one sorted array answers "form of player p going into game g"
+FORM_KEY_STRIDE = 10_000_000
+
+
+def calculate_lineup_points(games_df, lineups_df):
+    """
+    Calculate the points (3 win, 1 draw, 0 loss) every lineup entry earned for the player's club.
+
+    Args:
+        games_df (pd.DataFrame): DataFrame of games.
+        lineups_df (pd.DataFrame): DataFrame of game lineups with at least 'game_id', 'player_id' and 'club_id'.
+    Returns:
+        pd.DataFrame: DataFrame with 'game_id', 'player_id', 'season', 'competition_id', 'date' and 'points'.
+    """
+    merged_df = lineups_df[["game_id", "player_id", "club_id"]].merge(
+        games_df[["game_id", "season", "competition_id", "date", "home_club_id", "away_club_id", "home_club_goals",
+                  "away_club_goals"]],
+        on="game_id",
+        how="inner"
+    )
+
+    # Vectorized calculation of points
+    conditions = [
+        (merged_df["club_id"] == merged_df["home_club_id"]) & (merged_df["home_club_goals"] > merged_df["away_club_goals"]),
+        (merged_df["club_id"] == merged_df["home_club_id"]) & (merged_df["home_club_goals"] == merged_df["away_club_goals"]),
+        (merged_df["club_id"] == merged_df["away_club_id"]) & (merged_df["away_club_goals"] > merged_df["home_club_goals"]),
+        (merged_df["club_id"] == merged_df["away_club_id"]) & (merged_df["away_club_goals"] == merged_df["home_club_goals"])
+    ]
+    choices = [3, 1, 3, 1]
+    merged_df["points"] = np.select(conditions, choices, default=0)
+    return merged_df[["game_id", "player_id", "season", "competition_id", "date", "points"]]
+
+
+def empty_state():
+    return {
+        "player_id": np.array([], dtype=np.int64),
+        "points": np.array([], dtype=np.int64),
+        "games": np.array([], dtype=np.int64),
+        "season_player_id": np.array([], dtype=np.int64),
+        "season": np.array([], dtype=np.int64),
+        "competition_id": np.array([], dtype=str),
+        "season_points": np.array([], dtype=np.int64),
+        "season_games": np.array([], dtype=np.int64),
+        "entry_player_id": np.array([], dtype=np.int32),
+        "entry_game_id": np.array([], dtype=np.int32),
+        "entry_day": np.array([], dtype=np.int32),
+        "entry_points": np.array([], dtype=np.int8),
+        "game_ids": np.array([], dtype=np.int64),
+    }
+
+
+def write_atomically(path, write):
+    """
+    Write a file with write(f) to a temporary file of its own next to path and move it into place. Neither an
+    interrupted write nor a concurrent run of the precompute can leave a half written file behind.
+    """
+    with tempfile.NamedTemporaryFile(dir=os.path.dirname(path), suffix=".tmp", delete=False) as f:
+        try:
+            write(f)
+        except BaseException:
+            f.close()
+            os.remove(f.name)
+            raise
+    os.replace(f.name, path)
+
+
+def load_state():
+    """
+    Load the GPA accumulators of the last run plus the checkpoints of an interrupted one, or empty accumulators if
+    there is none. A state written by an older version of this script lacks some of the accumulators and is
+    discarded.
+    """
+    state = empty_state()
+    if os.path.exists(state_path):
+        with np.load(state_path) as saved_state:
+            if all(key in saved_state for key in empty_state()):
+                state = {key: saved_state[key] for key in empty_state()}
+
+    for points_df, game_ids in load_checkpoints():
+        # A checkpoint of a concurrent run may already be part of the state
+        new_game_ids = np.setdiff1d(game_ids, state["game_ids"], assume_unique=True)
+        state = fold_points(state, points_df[points_df["game_id"].isin(new_game_ids)], new_game_ids)
+    return state
+
+
+def save_state(state):
+    write_atomically(state_path, lambda f: np.savez(f, **state))
+
+
+def save_checkpoint(points_df, game_ids):
+    """
+    Write the points of a folded chunk of games, named after its first game.
+    """
+    os.makedirs(checkpoint_folder, exist_ok=True)
+    checkpoint = {
+        "game_id": points_df["game_id"].to_numpy(np.int32),
+        "player_id": points_df["player_id"].to_numpy(np.int32),
+        "season": points_df["season"].to_numpy(np.int64),
+        "competition_id": points_df["competition_id"].to_numpy(str),
+        "day": points_df["date"].to_numpy("datetime64[D]").astype(np.int32),
+        "points": points_df["points"].to_numpy(np.int8),
+        "game_ids": game_ids,
+    }
+    path = os.path.join(checkpoint_folder, f"chunk_{game_ids[0]}.npz")
+    write_atomically(path, lambda f: np.savez(f, **checkpoint))
+
+
+def load_checkpoints():
+    """
+    Yield the points DataFrame and the game IDs of every checkpoint.
+    """
+    if not os.path.isdir(checkpoint_folder):
+        return
+    for name in sorted(os.listdir(checkpoint_folder)):
+        if not name.endswith(".npz"):
+            continue
+        with np.load(os.path.join(checkpoint_folder, name)) as checkpoint:
+            points_df = pd.DataFrame({
+                "game_id": checkpoint["game_id"],
+                "player_id": checkpoint["player_id"],
+                "season": checkpoint["season"],
+                "competition_id": checkpoint["competition_id"],
+                "date": checkpoint["day"].astype("datetime64[D]"),
+                "points": checkpoint["points"],
+            })
+            yield points_df, checkpoint["game_ids"]
+
+
+def clear_checkpoints():
+    if not os.path.isdir(checkpoint_folder):
+        return
+    for name in os.listdir(checkpoint_folder):
+        if not name.endswith(".npz"):
+            # A checkpoint a concurrent run is writing
+            continue
+        try:
+            os.remove(os.path.join(checkpoint_folder, name))
+        except FileNotFoundError:
+            # Removed by a concurrent run
+            pass
+
+
+def add_totals(keys, points, games, totals):
+    """
+    Add the 'sum' and 'count' columns of totals to the points and games accumulators with the index keys.
+    """
+    accumulated = pd.DataFrame({"sum": points, "count": games}, index=keys)
+    return accumulated.add(totals, fill_value=0).astype(np.int64)
+
+
+def fold_points(state, points_df, game_ids):
+    """
+    Add the points of points_df to the accumulators and mark game_ids as processed.
+    """
+    career = add_totals(pd.Index(state["player_id"], name="player_id"), state["points"], state["games"],
+                        points_df.groupby("player_id")["points"].agg(["sum", "count"]))
+
+    season_keys = pd.MultiIndex.from_arrays([state["season_player_id"], state["season"], state["competition_id"]],
+                                            names=["player_id", "season", "competition_id"])
+    season_totals = points_df.astype({"season": np.int64, "competition_id": str}).groupby(
+        ["player_id", "season", "competition_id"])["points"].agg(["sum", "count"])
+    season = add_totals(season_keys, state["season_points"], state["season_games"], season_totals)
+
+    return {
+        "player_id": career.index.to_numpy(np.int64),
+        "points": career["sum"].to_numpy(),
+        "games": career["count"].to_numpy(),
+        "season_player_id": season.index.get_level_values("player_id").to_numpy(np.int64),
+        "season": season.index.get_level_values("season").to_numpy(np.int64),
+        "competition_id": season.index.get_level_values("competition_id").to_numpy(str),
+        "season_points": season["sum"].to_numpy(),
+        "season_games": season["count"].to_numpy(),
+        "entry_player_id": np.concatenate([state["entry_player_id"], points_df["player_id"].to_numpy(np.int32)]),
+        "entry_game_id": np.concatenate([state["entry_game_id"], points_df["game_id"].to_numpy(np.int32)]),
+        "entry_day": np.concatenate([state["entry_day"], points_df["date"].to_numpy("datetime64[D]").astype(np.int32)]),
+        "entry_points": np.concatenate([state["entry_points"], points_df["points"].to_numpy(np.int8)]),
+        "game_ids": np.union1d(state["game_ids"], game_ids),
+    }
+
+
+def state_to_gpas(state):
+    return pd.DataFrame({"player_id": state["player_id"], "gpa": state["points"] / state["games"]})
+
+
+def state_to_season_gpas(state):
+    return pd.DataFrame({
+        "player_id": state["season_player_id"],
+        "season": state["season"],
+        "competition_id": state["competition_id"],
+        "gpa": state["season_points"] / state["season_games"],
+        "games": state["season_games"],
+    })
+
+
+def calculate_rolling_form(player_ids, game_ids, days, points, form_games=FORM_GAMES):
+    """
+    Calculate the form of every lineup entry: the average points of the player's previous form_games games, going
+    into the game. The first game of a player has no form (NaN).
+
+    Returns:
+        dict: 'key' (game_id * FORM_KEY_STRIDE + player_id, sorted) and 'form' (float32) arrays.
+    """
+    order = np.lexsort((game_ids, days, player_ids))
+    ordered_players = player_ids[order]
+    cumulative = np.concatenate([[0], np.cumsum(points[order], dtype=np.int64)])
+
+    # Position of every entry within the games of its player
+    rows = np.arange(len(order))
+    group_starts = np.flatnonzero(np.r_[True, ordered_players[1:] != ordered_players[:-1]]) if len(order) else rows
+    position = rows - np.repeat(group_starts, np.diff(np.r_[group_starts, len(order)]))
+
+    previous = np.minimum(position, form_games)
+    previous_points = cumulative[rows] - cumulative[rows - previous]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        form = np.where(previous > 0, previous_points / previous, np.nan).astype(np.float32)
+
+    keys = game_ids[order].astype(np.int64) * FORM_KEY_STRIDE + ordered_players
+    by_key = np.argsort(keys, kind='stable')
+    return {"key": keys[by_key], "form": form[by_key]}
+
+
+def write_outputs(state):
+    """
+    Write the career GPAs, season GPAs and form tables of the accumulators, each via a temporary file so a
+    concurrently starting app never reads a half written table.
+    """
+    final_gpa_df = state_to_gpas(state)
+    write_atomically(final_output_path, lambda f: final_gpa_df.to_csv(f, index=False))
+    season_gpa_df = state_to_season_gpas(state)
+    write_atomically(season_output_path, lambda f: season_gpa_df.to_csv(f, index=False))
+
+    form = calculate_rolling_form(state["entry_player_id"].astype(np.int64), state["entry_game_id"],
+                                  state["entry_day"], state["entry_points"])
+    write_atomically(form_output_path, lambda f: np.savez(f, **form))
+    return final_gpa_df
+
+
+def precompute_player_gpas(games_df, lineups_df, rebuild=False):
+    """
+    Bring the Game Point Average (GPA) of every player in the lineups up to date and write it to
+    data/player_gpas.csv, the GPA per (player, season, competition) to data/player_season_gpas.csv and the form of
+    every player going into each of their games to data/player_form.npz. Only the games that are not part of the
+    accumulators yet are processed.
+
+    Args:
+        games_df (pd.DataFrame): DataFrame of games.
+        lineups_df (pd.DataFrame): DataFrame of game lineups.
+        rebuild (bool): Discard the accumulators and process all games again, e.g. after results were corrected.
+    Returns:
+        pd.DataFrame: DataFrame with 'player_id' and 'gpa'.
+    """
+    if rebuild:
+        clear_checkpoints()
+    state = empty_state() if rebuild else load_state()
+
+    # Only games with a lineup and a result count as processed, the missing part may be added by a later dump
+    scored = games_df["home_club_goals"].notna() & games_df["away_club_goals"].notna()
+    lineup_game_ids = np.intersect1d(lineups_df["game_id"].to_numpy(np.int64),
+                                     games_df.loc[scored, "game_id"].to_numpy(np.int64))
+    new_game_ids = np.setdiff1d(lineup_game_ids, state["game_ids"], assume_unique=True)
+
+    outputs = [final_output_path, season_output_path, form_output_path]
+    if len(new_game_ids) == 0 and all(os.path.exists(path) for path in outputs):
+        return state_to_gpas(state)
+
+    print(f"Folding the lineups of {len(new_game_ids)} new games into the GPAs of {len(state['player_id'])} players...")
+    points_df = calculate_lineup_points(games_df, lineups_df[lineups_df["game_id"].isin(new_game_ids)])
+    points_df = points_df.sort_values("game_id", kind="mergesort")
+    game_ids = points_df["game_id"].to_numpy(np.int64)
+
+    # Games are folded in chunks along the sorted game ids, every chunk is a slice and ends with a checkpoint of
+    # only its own points
+    chunk_bounds = np.searchsorted(game_ids, new_game_ids[::CHUNK_SIZE])
+    chunk_bounds = np.append(chunk_bounds, len(game_ids))
+    num_chunks = len(chunk_bounds) - 1
+    for i in range(num_chunks):
+        chunk = points_df.iloc[chunk_bounds[i]:chunk_bounds[i + 1]]
+        chunk_game_ids = new_game_ids[i * CHUNK_SIZE:(i + 1) * CHUNK_SIZE]
+        state = fold_points(state, chunk, chunk_game_ids)
+        save_checkpoint(chunk, chunk_game_ids)
+        print(f"Chunk {i + 1}/{num_chunks} processed and saved.")
+
+    # The complete state replaces the checkpoints
+    save_state(state)
+    clear_checkpoints()
+    final_gpa_df = write_outputs(state)
+    print(f"GPA calculations completed and saved to '{final_output_path}', '{season_output_path}' and "
+          f"'{form_output_path}'.")
+    return final_gpa_df
+
+
+if __name__ == "__main__":
+    # Load data once
+    print("Loading data...")
+    games_df = read_csv_table("games")
+    lineups_df = read_csv_table("gameLineups")
+    precompute_player_gpas(games_df, lineups_df, rebuild="--rebuild" in sys.argv)
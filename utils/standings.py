@@ -0,0 +1,217 @@
+import numpy as np
+import pandas as pd
+from utils.tables import files
+
+# Columns of a league table, in the order calculate_ranking has always returned them
+RANKING_COLUMNS = ['Team', 'club_id', 'Wins', 'Losses', 'Draws', 'GF', 'GA', 'Points', 'GD', 'Rank']
+
+# Criteria that separate clubs with the same number of points, in order. Supported are the table columns
+# 'GD', 'GF', 'GA' (fewer is better), 'Wins' and 'H2H', the points in the games between the clubs level on points.
+DEFAULT_TIE_BREAKERS = ['GD', 'GF']
+TIE_BREAKERS = ['GD', 'GF', 'GA', 'Wins', 'H2H']
+
+# A round is played within this many days after its median game day, games of the round after that are postponed
+ROUND_MAX_DAYS = np.timedelta64(3, 'D')
+
+
+def club_results(games):
+    """
+    Turn the games into one row per club and game with the result from the view of that club.
+
+    Args:
+        games (pd.DataFrame): DataFrame of games with at least 'competition_id', 'season', 'home_club_id',
+            'away_club_id', 'home_club_name', 'away_club_name', 'home_club_goals' and 'away_club_goals'.
+    Returns:
+        pd.DataFrame: 'competition_id', 'season', 'club_id', 'opponent_id', 'club_name', 'GF', 'GA', 'Wins',
+        'Losses', 'Draws', 'Points' and 'order', the position of the club's first appearance in games.
+    """
+    num_games = len(games)
+    home_goals = games['home_club_goals'].to_numpy()
+    away_goals = games['away_club_goals'].to_numpy()
+    competition_ids = games['competition_id'].astype(str).to_numpy()
+    seasons = games['season'].to_numpy()
+    home_ids = games['home_club_id'].to_numpy()
+    away_ids = games['away_club_id'].to_numpy()
+
+    results = pd.DataFrame({
+        'competition_id': np.concatenate([competition_ids, competition_ids]),
+        'season': np.concatenate([seasons, seasons]),
+        'club_id': np.concatenate([home_ids, away_ids]),
+        'opponent_id': np.concatenate([away_ids, home_ids]),
+        'club_name': np.concatenate([games['home_club_name'].to_numpy(), games['away_club_name'].to_numpy()]),
+        'GF': np.concatenate([home_goals, away_goals]),
+        'GA': np.concatenate([away_goals, home_goals]),
+        # Home club of a game first, then the away club, then the next game
+        'order': np.concatenate([np.arange(num_games) * 2, np.arange(num_games) * 2 + 1]),
+    })
+    results['Wins'] = (results['GF'] > results['GA']).astype(np.int64)
+    results['Losses'] = (results['GF'] < results['GA']).astype(np.int64)
+    results['Draws'] = 1 - results['Wins'] - results['Losses']
+    results['Points'] = 3 * results['Wins'] + results['Draws']
+    return results
+
+
+def head_to_head_points(results, table):
+    """
+    Points every club of the table earned in the games against the clubs with the same number of points.
+    """
+    group_keys = ['competition_id', 'season']
+    points = table.set_index(group_keys + ['club_id'])['Points']
+    own_points = points.reindex(pd.MultiIndex.from_frame(results[group_keys + ['club_id']])).to_numpy()
+    opponent_points = points.reindex(pd.MultiIndex.from_frame(
+        results[group_keys + ['opponent_id']].rename(columns={'opponent_id': 'club_id'}))).to_numpy()
+    level = results[own_points == opponent_points]
+    h2h = level.groupby(group_keys + ['club_id'], sort=False)['Points'].sum()
+    return h2h.reindex(pd.MultiIndex.from_frame(table[group_keys + ['club_id']]), fill_value=0).to_numpy()
+
+
+def calculate_standings(games, tie_breakers=None, team_names=None):
+    """
+    Calculate the league table of every (competition_id, season) in games at once.
+
+    Args:
+        games (pd.DataFrame): DataFrame of games, see club_results.
+        tie_breakers (list): Criteria for clubs with the same number of points, see TIE_BREAKERS.
+            Defaults to DEFAULT_TIE_BREAKERS. Clubs that are still level keep the order they first appear in games.
+        team_names (callable): Maps a club name to the name shown in the 'Team' column, e.g. get_club_shorthand.
+    Returns:
+        pd.DataFrame: 'competition_id', 'season', 'club_name' and the RANKING_COLUMNS, sorted by competition,
+        season and rank.
+    """
+    tie_breakers = DEFAULT_TIE_BREAKERS if tie_breakers is None else tie_breakers
+    unknown = [criterion for criterion in tie_breakers if criterion not in TIE_BREAKERS]
+    if unknown:
+        raise ValueError(f"Unknown tie breakers {unknown}, supported are {TIE_BREAKERS}.")
+
+    results = club_results(games)
+    table = results.groupby(['competition_id', 'season', 'club_id'], sort=False).agg(
+        club_name=('club_name', 'first'),
+        Wins=('Wins', 'sum'),
+        Losses=('Losses', 'sum'),
+        Draws=('Draws', 'sum'),
+        GF=('GF', 'sum'),
+        GA=('GA', 'sum'),
+        Points=('Points', 'sum'),
+        order=('order', 'min'),
+    ).reset_index()
+    table['GD'] = table['GF'] - table['GA']
+    if 'H2H' in tie_breakers:
+        table['H2H'] = head_to_head_points(results, table)
+
+    # np.lexsort sorts by the last key first: competition and season, then points, the tie breakers and the order
+    descending = {'GA': False}
+    sort_keys = [table['order'].to_numpy()]
+    for criterion in reversed(tie_breakers):
+        values = table[criterion].to_numpy()
+        sort_keys.append(-values if descending.get(criterion, True) else values)
+    competition_codes = pd.factorize(table['competition_id'], sort=True)[0]
+    sort_keys += [-table['Points'].to_numpy(), table['season'].to_numpy(), competition_codes]
+    table = table.iloc[np.lexsort(sort_keys)].reset_index(drop=True)
+
+    table['Rank'] = table.groupby(['competition_id', 'season'], sort=False).cumcount() + 1
+    names = table['club_name']
+    if team_names is not None:
+        unique_names = names.dropna().unique()
+        names = names.map(dict(zip(unique_names, map(team_names, unique_names))))
+    table['Team'] = names
+    return table[['competition_id', 'season', 'club_name'] + RANKING_COLUMNS]
+
+
+def calculate_ranking(data, tie_breakers=None, team_names=None):
+    """
+    Calculate the league table of the games of a single competition and season.
+
+    Args:
+        data (pd.DataFrame): DataFrame of games, see club_results.
+        tie_breakers (list): Criteria for clubs with the same number of points, see calculate_standings.
+        team_names (callable): Maps a club name to the name shown in the 'Team' column.
+    Returns:
+        pd.DataFrame: The RANKING_COLUMNS, one row per club, sorted by rank.
+    """
+    return calculate_standings(data, tie_breakers, team_names)[RANKING_COLUMNS]
+
+
+def calculate_standings_history(games, tie_breakers=None):
+    """
+    Calculate the league table of every (competition_id, season) in games after each matchday. The games are
+    processed in date order and every matchday only adds its own games to the running totals of the matchday
+    before. A matchday ends on the date of the last game of its round that is played within ROUND_MAX_DAYS of the
+    round's median game day. Games that are played later (postponed games) count from their own date on.
+
+    Args:
+        games (pd.DataFrame): DataFrame of games, see club_results, with 'date' and optionally 'round'.
+        tie_breakers (list): Criteria for clubs with the same number of points, see calculate_standings. 'H2H' is
+            not supported here.
+    Returns:
+        dict: (competition_id, season) -> dict with 'club_id' (clubs in order of first appearance), 'date' (last day
+        of every matchday, datetime64[D]) and one (matchday x club) int16 array each for 'Wins', 'Losses', 'Draws',
+        'GF', 'GA', 'Points' and 'Rank'.
+    """
+    tie_breakers = DEFAULT_TIE_BREAKERS if tie_breakers is None else tie_breakers
+    unsupported = [criterion for criterion in tie_breakers if criterion not in TIE_BREAKERS or criterion == 'H2H']
+    if unsupported:
+        raise ValueError(f"Unsupported tie breakers {unsupported} for the standings history.")
+
+    history = {}
+    group_keys = [games['competition_id'].astype(str), games['season']]
+    for (competition_id, season), season_games in games.groupby(group_keys, sort=False):
+        # Clubs in order of their first appearance, which also decides between clubs that are still level
+        club_index, club_ids = pd.factorize(
+            np.column_stack([season_games['home_club_id'].to_numpy(), season_games['away_club_id'].to_numpy()]).ravel())
+        home_index, away_index = club_index[0::2], club_index[1::2]
+
+        days = season_games['date'].to_numpy('datetime64[D]')
+        rounds = season_games['round'] if 'round' in season_games else pd.Series(days, index=season_games.index)
+        round_keys = rounds.to_numpy()
+        game_days = pd.Series(days, index=season_games.index)
+        # Postponed games must not move the end of their round, they would pull the other games of the next round in
+        in_round = game_days <= game_days.groupby(round_keys).transform('median') + ROUND_MAX_DAYS
+        round_ends = game_days[in_round].groupby(round_keys[in_round.to_numpy()]).max().to_numpy()
+        # The last game day always ends a matchday, also when some games have no round
+        matchday_ends = np.unique(np.append(round_ends, days.max()))
+        matchday = np.searchsorted(matchday_ends, days)
+
+        home_goals = season_games['home_club_goals'].fillna(0).to_numpy(np.int64)
+        away_goals = season_games['away_club_goals'].fillna(0).to_numpy(np.int64)
+        shape = (len(matchday_ends), len(club_ids))
+        totals = {name: np.zeros(shape, dtype=np.int64) for name in ['Wins', 'Losses', 'Draws', 'GF', 'GA']}
+        for own, other, own_goals, other_goals in ((home_index, away_index, home_goals, away_goals),
+                                                   (away_index, home_index, away_goals, home_goals)):
+            np.add.at(totals['Wins'], (matchday, own), own_goals > other_goals)
+            np.add.at(totals['Losses'], (matchday, own), own_goals < other_goals)
+            np.add.at(totals['Draws'], (matchday, own), own_goals == other_goals)
+            np.add.at(totals['GF'], (matchday, own), own_goals)
+            np.add.at(totals['GA'], (matchday, own), other_goals)
+
+        # Running totals: every matchday is the previous one plus its own games
+        totals = {name: np.cumsum(values, axis=0) for name, values in totals.items()}
+        totals['Points'] = 3 * totals['Wins'] + totals['Draws']
+        totals['GD'] = totals['GF'] - totals['GA']
+
+        ranks = np.empty(shape, dtype=np.int64)
+        first_appearance = np.arange(len(club_ids))
+        for day in range(len(matchday_ends)):
+            sort_keys = [first_appearance]
+            for criterion in reversed(tie_breakers):
+                values = totals[criterion][day]
+                sort_keys.append(values if criterion == 'GA' else -values)
+            sort_keys.append(-totals['Points'][day])
+            ranks[day, np.lexsort(sort_keys)] = first_appearance + 1
+
+        history[(competition_id, int(season))] = {
+            'club_id': club_ids,
+            'date': matchday_ends,
+            **{name: totals[name].astype(np.int16) for name in ['Wins', 'Losses', 'Draws', 'GF', 'GA', 'Points']},
+            'Rank': ranks.astype(np.int16),
+        }
+    return history
+
+
+def create_standings_df(games_df):
+    """
+    Calculate the final league table of every (competition_id, season) and write it to data/standings.csv, next to
+    data/seasons.csv. The 'Team' column holds the full club name, the app shortens it when it loads the table.
+    """
+    standings = calculate_standings(games_df)[['competition_id', 'season'] + RANKING_COLUMNS]
+    standings.to_csv(files["standings"], index=False)
+    return standings
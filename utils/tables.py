@@ -0,0 +1,159 @@
+import hashlib
+import json
+import os
+import pandas as pd
+
+try:
+    import pyarrow.feather as feather
+    columnar_cache_available = True
+except ImportError:
+    columnar_cache_available = False
+
+# When set (gunicorn.conf.py does), the feather files are memory mapped instead of read into process memory.
+# Numeric, date and categorical columns then point straight at the page cache, which all workers share.
+memory_map_tables = os.environ.get("FOOTBALLVIS_MEMORY_MAP") == "1"
+
+# Set the correct root directory for your project
+base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+data_folder = os.path.join(base_dir, 'data')
+cache_folder = os.path.join(data_folder, 'cache')
+cache_manifest = os.path.join(cache_folder, 'manifest.json')
+
+# The Transfermarkt dump is shipped as two zip files next to app.py
+source_zips = [os.path.join(base_dir, 'data1.zip'), os.path.join(base_dir, 'data2.zip')]
+
+# Define the paths to all CSV files
+files = {
+    "appearances": os.path.join(data_folder, 'appearances.csv'),
+    "clubGames": os.path.join(data_folder, 'club_games.csv'),
+    "clubs": os.path.join(data_folder, 'clubs.csv'),
+    "competitions": os.path.join(data_folder, 'competitions.csv'),
+    "gameEvents": os.path.join(data_folder, 'game_events.csv'),
+    "gameLineups": os.path.join(data_folder, 'game_lineups.csv'),
+    "games": os.path.join(data_folder, 'games.csv'),
+    "player_valuations": os.path.join(data_folder, 'player_valuations.csv'),
+    "players": os.path.join(data_folder, 'players.csv'),
+    "transfers": os.path.join(data_folder, 'transfers.csv'),
+    "seasons": os.path.join(data_folder, 'seasons.csv'),
+    "standings": os.path.join(data_folder, 'standings.csv'),
+}
+
+# Typed columnar copy of every CSV file
+cache_files = {name: os.path.join(cache_folder, f"{name}.feather") for name in files}
+
+# Explicit column types per table: ids as int32, low-cardinality strings as categories and dates parsed on load.
+# Columns that are not listed keep the type pandas infers from the CSV.
+table_dtypes = {
+    "appearances": {"game_id": "int32", "player_id": "int32", "player_club_id": "int32",
+                    "competition_id": "category", "yellow_cards": "int8", "red_cards": "int8",
+                    "goals": "int32", "assists": "int32", "minutes_played": "int32"},
+    "clubGames": {"game_id": "int32", "club_id": "int32", "opponent_id": "int32", "hosting": "category"},
+    "clubs": {"club_id": "int32", "domestic_competition_id": "category"},
+    "competitions": {"type": "category", "sub_type": "category", "confederation": "category"},
+    "gameEvents": {"game_id": "int32", "club_id": "int32", "type": "category"},
+    "gameLineups": {"game_id": "int32", "player_id": "int32", "club_id": "int32",
+                    "type": "category", "position": "category"},
+    "games": {"game_id": "int32", "competition_id": "category", "season": "int16",
+              "home_club_id": "int32", "away_club_id": "int32", "competition_type": "category"},
+    "player_valuations": {"player_id": "int32", "current_club_id": "int32",
+                          "player_club_domestic_competition_id": "category"},
+    "players": {"player_id": "int32", "sub_position": "category", "foot": "category",
+                "current_club_domestic_competition_id": "category"},
+    "transfers": {"player_id": "int32"},
+    "seasons": {"season": "int16", "competition_id": "category"},
+    "standings": {"competition_id": "category", "season": "int16", "club_id": "int32"},
+}
+
+table_dates = {
+    "appearances": ["date"],
+    "gameEvents": ["date"],
+    "gameLineups": ["date"],
+    "games": ["date"],
+    "player_valuations": ["date"],
+    "transfers": ["transfer_date"],
+    "seasons": ["start", "end"],
+}
+
+
+def read_csv_table(name):
+    """
+    Parse the CSV file of a table with its explicit column types.
+    """
+    return pd.read_csv(files[name], dtype=table_dtypes.get(name), parse_dates=table_dates.get(name), low_memory=False)
+
+
+def read_cached_table(name):
+    """
+    Read the columnar copy of a table. Returns None if there is no usable copy, so the caller can fall back to CSV.
+    Memory mapped tables are read-only: their columns can be replaced, but not modified in place.
+    """
+    if not columnar_cache_available or not os.path.exists(cache_files[name]):
+        return None
+    if memory_map_tables:
+        # split_blocks keeps one block per column, so pandas uses the mapped buffers without copying them
+        return feather.read_table(cache_files[name], memory_map=True).to_pandas(split_blocks=True)
+    return pd.read_feather(cache_files[name])
+
+
+def zip_checksum(zip_paths=None):
+    """
+    Return the sha256 checksum over the source zip files, or None if one of them is missing.
+    """
+    zip_paths = zip_paths or source_zips
+    if not all(os.path.exists(path) for path in zip_paths):
+        return None
+
+    digest = hashlib.sha256()
+    for path in zip_paths:
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+def cached_checksum():
+    """
+    Return the checksum of the zip files the columnar cache was built from, or None if there is no cache or it was
+    built without pyarrow, which is installed now.
+    """
+    if not os.path.exists(cache_manifest):
+        return None
+    with open(cache_manifest) as f:
+        manifest = json.load(f)
+    # Extracted without pyarrow: build the feather files now that they can be written
+    if manifest.get("format") == "csv" and columnar_cache_available:
+        return None
+    return manifest.get("checksum")
+
+
+def build_columnar_cache(checksum, names=None):
+    """
+    Convert every extracted CSV file into a typed feather file and record the checksum of the source zips,
+    so the cache is only rebuilt when the zips change. Without pyarrow only the checksum is recorded and the tables
+    are read from the CSV files.
+
+    Args:
+        checksum (str): Checksum of the source zips the CSV files were extracted from.
+        names (list, optional): Only convert these tables, e.g. a table that was added to an existing cache.
+    """
+    os.makedirs(cache_folder, exist_ok=True)
+    if not columnar_cache_available:
+        print("pyarrow is not installed. Skipping the columnar cache, tables will be read from CSV.")
+        names = []
+
+    for name in files if names is None else names:
+        df = read_csv_table(name)
+        # Write to a temporary file first so a concurrently starting process never reads a half written file.
+        # Uncompressed single-chunk columns are required for memory mapping them without a copy.
+        tmp_path = cache_files[name] + ".tmp"
+        df.reset_index(drop=True).to_feather(tmp_path, compression="uncompressed", chunksize=max(len(df), 1))
+        os.replace(tmp_path, cache_files[name])
+        print(f"Cached '{files[name]}' as '{cache_files[name]}'.")
+
+    with open(cache_manifest, 'w') as f:
+        json.dump({"checksum": checksum, "format": "feather" if columnar_cache_available else "csv",
+                   "tables": sorted(files)}, f)
+
+
+if __name__ == "__main__":
+    build_columnar_cache(zip_checksum())
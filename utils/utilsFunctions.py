@@ -1,12 +1,12 @@
 import zipfile
 import os
+from functools import lru_cache
+import numpy as np
 import pandas as pd
 from utils.consts import *
-
-player_valuations_df = pd.read_csv('data/player_valuations.csv')
-
-
-
+from utils.standings import RANKING_COLUMNS, calculate_standings_history
+from utils.figure_cache import cached_result
+from utils.players_gpas_precompute import FORM_KEY_STRIDE, form_output_path, precompute_player_gpas, season_output_path
 
 
 def get_competition_name(competition_id):
@@ -78,6 +78,112 @@ def get_season_name(season_id):
     return seasons_df[seasons_df['season'] == season_id]['season_name'].values[0]
 
 
+# Valuation keys combine player and day, so one sorted array answers "latest valuation of player p before day d"
+VALUATION_KEY_STRIDE = 1_000_000
+
+
+def to_days(dates):
+    """
+    Convert dates (Timestamps, datetime64 arrays or Series) to integer days since the epoch.
+    """
+    return np.asarray(dates, dtype='datetime64[ns]').astype('datetime64[D]').astype(np.int64)
+
+
+def build_valuation_arrays(valuations):
+    """
+    Sort the player valuations by player and date once and return them as flat numpy arrays.
+
+    Returns:
+        dict: 'player_id', 'date' (datetime64[ns]), 'day' (days since epoch), 'value' and 'key' arrays, all in
+        (player_id, date) order. 'key' is player_id * VALUATION_KEY_STRIDE + day and therefore sorted as well.
+        'players' holds the sorted unique player ids and 'offsets' the position where the valuations of each of them
+        start, with one extra entry for the end, so the valuations of players[i] are offsets[i]:offsets[i + 1].
+    """
+    ordered = valuations.sort_values(['player_id', 'date'], kind='mergesort')
+    player_ids = ordered['player_id'].to_numpy(np.int64)
+    days = to_days(ordered['date'])
+    players, starts = np.unique(player_ids, return_index=True)
+    return {
+        'player_id': player_ids,
+        'date': ordered['date'].to_numpy('datetime64[ns]'),
+        'day': days,
+        'value': ordered['market_value_in_eur'].to_numpy(np.float64),
+        'key': player_ids * VALUATION_KEY_STRIDE + days,
+        'players': players,
+        'offsets': np.append(starts, len(player_ids)),
+    }
+
+
+def latest_valuation_positions(player_ids, start_day, end_day):
+    """
+    Find, for every player, the position of the latest valuation with start_day <= day < end_day in
+    valuation_arrays, or -1 if the player has none in that window.
+    """
+    player_ids = np.asarray(player_ids, dtype=np.int64)
+    positions = np.searchsorted(valuation_arrays['key'], player_ids * VALUATION_KEY_STRIDE + end_day, side='left') - 1
+    clipped = np.clip(positions, 0, None)
+    found = ((positions >= 0) & (valuation_arrays['player_id'][clipped] == player_ids) &
+             (valuation_arrays['day'][clipped] >= start_day))
+    return np.where(found, positions, -1)
+
+
+def build_season_windows(seasons):
+    """
+    Determine the valuation window [start, end) of every (competition_id, season) as days since the epoch.
+    A season lasts until the next season of the competition starts, and 2024 also includes the 2023 season.
+    """
+    starts = {}
+    ends = {}
+    for competition_id, season, start, end in zip(seasons['competition_id'], seasons['season'], to_days(seasons['start']),
+                                                  to_days(seasons['end'])):
+        starts.setdefault((competition_id, int(season)), int(start))
+        ends.setdefault((competition_id, int(season)), int(end))
+
+    windows = {}
+    for (competition_id, season), start in starts.items():
+        if season == 2024:
+            start = starts.get((competition_id, 2023), start)
+        end = starts.get((competition_id, season + 1), ends[(competition_id, season)])
+        windows[(competition_id, season)] = (start, end)
+    return windows
+
+
+def build_season_valuation_snapshot(appearances, games):
+    """
+    Materialize the latest market value of every player who appeared in a (competition_id, season), computed for all
+    of them at once per season window.
+
+    Returns:
+        dict: (competition_id, season) -> DataFrame indexed by player_id (sorted) with 'market_value_in_eur' and 'date'.
+    """
+    season_by_game = pd.Series(games['season'].to_numpy(), index=games['game_id'].to_numpy())
+    squads = pd.DataFrame({
+        'player_id': appearances['player_id'].to_numpy(),
+        'competition_id': appearances['competition_id'].astype(str).to_numpy(),
+        'season': appearances['game_id'].map(season_by_game).to_numpy(),
+    }).dropna().drop_duplicates()
+
+    snapshot = {}
+    for (competition_id, season), squad in squads.groupby(['competition_id', 'season']):
+        window = season_windows.get((competition_id, int(season)))
+        if window is None:
+            continue
+        player_ids = np.sort(squad['player_id'].to_numpy())
+        positions = latest_valuation_positions(player_ids, *window)
+        found = positions >= 0
+        snapshot[(competition_id, int(season))] = pd.DataFrame({
+            'market_value_in_eur': np.where(found, valuation_arrays['value'][positions], np.nan),
+            'date': np.where(found, valuation_arrays['date'][positions], np.datetime64('NaT')),
+        }, index=pd.Index(player_ids, name='player_id'))
+    return snapshot
+
+
+# Built once at startup, so the market value lookups below never scan or re-parse the valuations table
+valuation_arrays = build_valuation_arrays(player_valuations_df)
+season_windows = build_season_windows(seasons_df)
+season_valuation_snapshot = build_season_valuation_snapshot(appearances_df, games_df)
+
+
 def get_player_market_value_by_season(player_df, season, competition_id):
     """
     Retrieve the market value of players during a specific season.
@@ -89,61 +195,34 @@ def get_player_market_value_by_season(player_df, season, competition_id):
     Returns:
         pd.DataFrame: DataFrame with players and their market value for the specified season.
     """
-
-    # Ensure dates are in datetime format
-    seasons_df['start'] = pd.to_datetime(seasons_df['start'])
-    seasons_df['end'] = pd.to_datetime(seasons_df['end'])
-    player_valuations_df['date'] = pd.to_datetime(player_valuations_df['date'])
-
-    # Get the season's start and end dates for the given competition
-    season_info = seasons_df[(seasons_df['season'] == season) & (seasons_df['competition_id'] == competition_id)]
-
-    if season_info.empty:
+    window = season_windows.get((competition_id, season))
+    if window is None:
         raise ValueError(f"Season {season} with competition ID {competition_id} not found in seasons_df.")
 
-    # Extract start and end dates
-    start_date = season_info.iloc[0]['start']
-    end_date = season_info.iloc[0]['end']
-
-    if season == 2024:
-        start_date = \
-            seasons_df[(seasons_df['season'] == 2023) & (seasons_df['competition_id'] == competition_id)].iloc[0][
-                'start']
-
-    # Check for next season and update the end date if the next season is available
-    next_season_info = seasons_df[
-        (seasons_df['season'] == season + 1) & (seasons_df['competition_id'] == competition_id)]
-    if not next_season_info.empty:
-        end_date = next_season_info.iloc[0]['start']
-
-    # Filter player evaluations for the given timeframe
-    filtered_evaluations = player_valuations_df[
-        (player_valuations_df['date'] >= start_date) &
-        (player_valuations_df['date'] < end_date)
-        ]
-    # filter player evaluations to only contain the players from the player_df
-    filtered_evaluations = filtered_evaluations[filtered_evaluations['player_id'].isin(player_df['player_id'])]
-    # get only the latest market value of each player
-    filtered_evaluations = filtered_evaluations.sort_values(by=['player_id', 'date']).groupby(
-        'player_id').last().reset_index()
-
-    # Merge player data with filtered evaluations
-    player_values = player_df[['player_id']].merge(filtered_evaluations, on='player_id', how='left')
-
-    if player_values.empty:
+    player_ids = np.unique(player_df['player_id'].to_numpy())
+    if len(player_ids) == 0:
         raise ValueError(
             f"No matching player evaluations found. Inputs: season={season}, competition={competition_id}, players={len(player_df)}")
 
-    # Sort and get the latest market value for each player
-    latest_market_values = (
-        player_values.sort_values(by=['player_id', 'date'])
-        .groupby('player_id', as_index=False)
-        .last()
-    )
+    # Players who appeared in the competition are read from the snapshot, everybody else is looked up in the window
+    values = np.full(len(player_ids), np.nan)
+    dates = np.full(len(player_ids), np.datetime64('NaT'), dtype='datetime64[ns]')
+    missing = np.ones(len(player_ids), dtype=bool)
 
-    # Return the relevant columns
-    result = latest_market_values[['player_id', 'market_value_in_eur', 'date']]
-    return result
+    season_snapshot = season_valuation_snapshot.get((competition_id, season))
+    if season_snapshot is not None:
+        rows = season_snapshot.index.get_indexer(player_ids)
+        missing = rows < 0
+        values[~missing] = season_snapshot['market_value_in_eur'].to_numpy()[rows[~missing]]
+        dates[~missing] = season_snapshot['date'].to_numpy()[rows[~missing]]
+
+    if missing.any():
+        positions = latest_valuation_positions(player_ids[missing], *window)
+        found = positions >= 0
+        values[missing] = np.where(found, valuation_arrays['value'][positions], np.nan)
+        dates[missing] = np.where(found, valuation_arrays['date'][positions], np.datetime64('NaT'))
+
+    return pd.DataFrame({'player_id': player_ids, 'market_value_in_eur': values, 'date': dates})
 
 
 def get_games_by_competition_and_season(games_df, competition_id, season):
@@ -176,43 +255,312 @@ def get_clubs_from_games(selected_games_df):
     return clubs_df[clubs_df['club_id'].isin(club_ids)]
 
 
-def interpolate_market_value(player_id, target_date):
-    target_date = pd.to_datetime(target_date)
+def interpolate_market_values(player_ids, target_dates):
+    """
+    Interpolate the market value of many (player, date) pairs at once, e.g. a whole squad at every match date.
+    Before the first and after the last valuation of a player the first and last value is used, between two
+    valuations the value is interpolated linearly by day and rounded to cents. Players without valuations are 0.
+
+    Args:
+        player_ids (array-like): Player IDs.
+        target_dates (array-like): Dates, one per player ID.
+    Returns:
+        np.ndarray: The market value of every pair, as float.
+    """
+    player_ids = np.asarray(player_ids, dtype=np.int64)
+    target_days = to_days(pd.to_datetime(np.asarray(target_dates).ravel())).reshape(player_ids.shape)
+    values = valuation_arrays['value']
+    days = valuation_arrays['day']
+    if len(values) == 0:
+        return np.zeros(player_ids.shape)
+
+    # Range of the valuations of every player in the sorted arrays, empty for players without valuations
+    players = valuation_arrays['players']
+    offsets = valuation_arrays['offsets']
+    index = np.clip(np.searchsorted(players, player_ids), 0, len(players) - 1)
+    known = players[index] == player_ids
+    first = np.where(known, offsets[index], 0)
+    last = np.where(known, offsets[index + 1] - 1, -1)
+
+    # Latest valuation on or before the target day, and the one after it
+    before = np.searchsorted(valuation_arrays['key'], player_ids * VALUATION_KEY_STRIDE + target_days, side='right') - 1
+    before = np.clip(before, first, np.maximum(last, first))
+    after = np.minimum(before + 1, np.maximum(last, first))
+
+    before_day = days[before]
+    after_day = days[after]
+    between = known & (before_day <= target_days) & (after_day > target_days)
+    span = np.where(between, after_day - before_day, 1)
+    interpolated = np.round(values[before] + (values[after] - values[before]) * (target_days - before_day) / span, 2)
+
+    # Outside the valuation range 'before' is clamped to the first or last valuation of the player
+    return np.where(known, np.where(between, interpolated, values[before]), 0.0)
 
-    # Filter the DataFrame for the specific player
-    player_valuations = player_valuations_df[player_valuations_df["player_id"] == player_id].copy()
 
-    if player_valuations.empty:
-        return 0
+def interpolate_market_value(player_id, target_date):
+    """
+    Interpolate the market value of a single player at a date, see interpolate_market_values.
+    """
+    return float(interpolate_market_values([player_id], [pd.to_datetime(target_date)])[0])
+
 
-    player_valuations["date"] = pd.to_datetime(player_valuations["date"])
+def build_club_games_order(games):
+    """
+    Order the games by club: every game appears twice, once for the home club and once for the away club. The order is
+    sorted by club ID and keeps the order of the games within a club.
 
-    player_valuations = player_valuations.sort_values("date")
+    Args:
+        games (pd.DataFrame): DataFrame of games with at least 'home_club_id' and 'away_club_id'.
+    Returns:
+        tuple: np.ndarray of the club IDs, np.ndarray of the row positions of their games, usable with games.iloc, and
+        np.ndarray of whether the club is the home club of the game.
+    """
+    club_ids = np.concatenate([games['home_club_id'].to_numpy(), games['away_club_id'].to_numpy()])
+    game_rows = np.tile(np.arange(len(games)), 2)
+    is_home = np.repeat([True, False], len(games))
+    order = np.lexsort((game_rows, club_ids))
+    return club_ids[order], game_rows[order], is_home[order]
 
-    # interpolation logic
-    if target_date < player_valuations["date"].min():
-        # If the target date is before the earliest valuation, return the first available value
-        return player_valuations.iloc[0]["market_value_in_eur"]
 
-    if target_date > player_valuations["date"].max():
-        # If the target date is after the latest valuation, we return the last available value
-        return player_valuations.iloc[-1]["market_value_in_eur"]
+def build_club_offsets(club_ids):
+    """
+    Map every club ID to the (start, stop) row range of its rows in a table sorted by club ID.
+    """
+    unique_ids, starts = np.unique(club_ids, return_index=True)
+    stops = np.append(starts[1:], len(club_ids))
+    return {club_id: (start, stop) for club_id, start, stop in zip(unique_ids.tolist(), starts.tolist(), stops.tolist())}
 
-    before = player_valuations[player_valuations["date"] <= target_date].iloc[-1]
-    after = player_valuations[player_valuations["date"] > target_date].iloc[0] if \
-        not player_valuations[player_valuations["date"] > target_date].empty else before
 
-    if before["date"] == after["date"]:
-        return before["market_value_in_eur"]  # If both dates are the same, return the market value directly
+def build_club_perspective_games(games, competitions):
+    """
+    Build the club-perspective games table: every game appears twice, once from the view of the home club and once
+    from the view of the away club, in the order of build_club_games_order. All derived columns are computed
+    column-wise in a single pass.
 
-    # Linear interpolation with the exact date
-    interpolated_value = (
-            before["market_value_in_eur"] +
-            (after["market_value_in_eur"] - before["market_value_in_eur"]) *
-            (target_date - before["date"]).days / (after["date"] - before["date"]).days
+    Args:
+        games (pd.DataFrame): DataFrame of games.
+        competitions (pd.DataFrame): DataFrame of competitions with at least 'competition_id' and 'type'.
+    Returns:
+        pd.DataFrame: All columns of games plus 'club_id', 'home_away', 'opponent_id', 'opponent',
+        'playing_team_name', 'goals_for', 'goals_against', 'result' and 'type', sorted by club and keeping the order
+        of the games within a club.
+    """
+    club_ids, game_rows, is_home = build_club_games_order(games)
+    perspective = games.iloc[game_rows].reset_index(drop=True)
+
+    home_goals = perspective['home_club_goals'].to_numpy()
+    away_goals = perspective['away_club_goals'].to_numpy()
+
+    perspective['club_id'] = club_ids
+    perspective['home_away'] = np.where(is_home, 'Home', 'Away')
+    perspective['opponent_id'] = np.where(is_home, perspective['away_club_id'], perspective['home_club_id'])
+    perspective['opponent'] = np.where(is_home, perspective['away_club_name'], perspective['home_club_name'])
+    perspective['playing_team_name'] = np.where(is_home, perspective['home_club_name'], perspective['away_club_name'])
+    perspective['goals_for'] = np.where(is_home, home_goals, away_goals)
+    perspective['goals_against'] = np.where(is_home, away_goals, home_goals)
+    perspective['result'] = np.select(
+        [perspective['goals_for'] > perspective['goals_against'],
+         perspective['goals_for'] == perspective['goals_against']],
+        ['win', 'draw'],
+        default='loss'
     )
+    perspective['type'] = perspective['competition_id'].map(competitions.set_index('competition_id')['type'])
+    return perspective
+
+
+# Built once at startup: each club's games are a contiguous slice, so a lookup costs O(games of that club)
+club_perspective_games_df = build_club_perspective_games(games_df, competitions_df)
+club_perspective_offsets = build_club_offsets(club_perspective_games_df['club_id'].to_numpy())
+
+
+def build_squad_index(appearances, games):
+    """
+    Aggregate the appearances of every player per (club, season, competition): minutes played, goals, assists,
+    cards and games. The rows of a squad are contiguous and sorted by player_id.
+
+    Args:
+        appearances (pd.DataFrame): DataFrame of appearances.
+        games (pd.DataFrame): DataFrame of games with at least 'game_id', 'season' and 'competition_id'.
+    Returns:
+        tuple: DataFrame with 'club_id', 'season', 'competition_id', 'player_id', 'minutes_played', 'goals',
+        'assists', 'yellow_cards', 'red_cards' and 'total_games', and a dict mapping every (club_id, season,
+        competition_id) to the (start, stop) row range of its squad.
+    """
+    game_ids = games['game_id'].to_numpy()
+    season_by_game = pd.Series(games['season'].to_numpy(), index=game_ids)
+    competition_by_game = pd.Series(games['competition_id'].astype(str).to_numpy(), index=game_ids)
+
+    squads = pd.DataFrame({
+        'club_id': appearances['player_club_id'].to_numpy(),
+        'season': appearances['game_id'].map(season_by_game).to_numpy(),
+        'competition_id': appearances['game_id'].map(competition_by_game).to_numpy(),
+        'player_id': appearances['player_id'].to_numpy(),
+        'minutes_played': pd.to_numeric(appearances['minutes_played'], errors='coerce').fillna(0).to_numpy(),
+        'goals': appearances['goals'].to_numpy(),
+        'assists': appearances['assists'].to_numpy(),
+        'yellow_cards': appearances['yellow_cards'].to_numpy(),
+        'red_cards': appearances['red_cards'].to_numpy(),
+        'game_id': appearances['game_id'].to_numpy(),
+    }).dropna(subset=['season', 'competition_id'])
+    squads['season'] = squads['season'].astype(np.int64)
+
+    squads = squads.groupby(['club_id', 'season', 'competition_id', 'player_id']).agg(
+        minutes_played=('minutes_played', 'sum'),
+        goals=('goals', 'sum'),
+        assists=('assists', 'sum'),
+        yellow_cards=('yellow_cards', 'sum'),
+        red_cards=('red_cards', 'sum'),
+        total_games=('game_id', 'count'),
+    ).reset_index()
+
+    # Squads start where the (club, season, competition) key changes
+    keys = squads[['club_id', 'season', 'competition_id']]
+    starts = np.flatnonzero((keys != keys.shift()).any(axis=1).to_numpy())
+    stops = np.append(starts[1:], len(squads))
+    offsets = {
+        (club_id, season, competition_id): (start, stop)
+        for club_id, season, competition_id, start, stop in zip(
+            keys['club_id'].to_numpy()[starts].tolist(), keys['season'].to_numpy()[starts].tolist(),
+            keys['competition_id'].to_numpy()[starts].tolist(), starts.tolist(), stops.tolist())
+    }
+    return squads, offsets
 
-    return round(interpolated_value, 2)
+
+def build_win_loss_summaries(perspective):
+    """
+    Count the wins, losses and draws of every club per (competition_id, season) for the complete, home and away
+    scopes from the club-perspective games table, so switching the scope never rescans the games.
+
+    Returns:
+        dict: (competition_id, season) -> {'complete' | 'home' | 'away': DataFrame with 'club_id', 'win', 'loss' and
+        'draw', sorted by club_id}.
+    """
+    # Unlike the team games view, the win/loss chart has always counted games without a score as draws
+    goals_for, goals_against = perspective['goals_for'], perspective['goals_against']
+    results = np.select([goals_for > goals_against, goals_for < goals_against], ['win', 'loss'], default='draw')
+    counts = perspective.assign(result=results).groupby(
+        ['competition_id', 'season', 'club_id', 'home_away', 'result'], observed=True).size()
+    counts = counts.unstack('result', fill_value=0).reindex(columns=['win', 'loss', 'draw'], fill_value=0)
+    counts.columns.name = None
+
+    summaries = {}
+    for (competition_id, season), season_counts in counts.groupby(level=['competition_id', 'season'], observed=True):
+        season_counts = season_counts.droplevel(['competition_id', 'season'])
+        scopes = {
+            scope: season_counts.xs(home_away, level='home_away').sort_index().reset_index()
+            for scope, home_away in (('home', 'Home'), ('away', 'Away'))
+            if home_away in season_counts.index.get_level_values('home_away')
+        }
+        scopes['complete'] = season_counts.groupby(level='club_id').sum().reset_index()
+        summaries[(competition_id, int(season))] = scopes
+    return summaries
+
+
+def get_club_games(club_id):
+    """
+    Retrieve the club-perspective games of a club without scanning the games table.
+
+    Args:
+        club_id (int): The club ID.
+    Returns:
+        pd.DataFrame: Slice of club_perspective_games_df with all games of the club (empty if there are none).
+    """
+    start, stop = club_perspective_offsets.get(club_id, (0, 0))
+    return club_perspective_games_df.iloc[start:stop]
+
+
+# Built once at startup from the club-perspective games table
+win_loss_summaries = build_win_loss_summaries(club_perspective_games_df)
+
+
+def get_win_loss_summary(competition_id, season, scope):
+    """
+    Retrieve the wins, losses and draws of every club in a competition and season.
+
+    Args:
+        competition_id (str): The competition ID.
+        season (int): The season year.
+        scope (str): 'complete', 'home' or 'away'.
+    Returns:
+        pd.DataFrame: 'club_id', 'win', 'loss' and 'draw', or None if there were no games.
+    """
+    summary = win_loss_summaries.get((competition_id, season), {}).get(scope)
+    return summary.copy() if summary is not None else None
+
+
+# Built once at startup: the squads of all clubs, seasons and competitions, so the team charts never scan the
+# games and appearances tables
+squad_index_df, squad_offsets = build_squad_index(appearances_df, games_df)
+players_row_index = pd.Index(players_df['player_id'])
+
+
+def get_squad(club_id, season, competition_id):
+    """
+    Retrieve the players of a club in a season and competition with their aggregated appearances.
+
+    Args:
+        club_id (int): The club ID.
+        season (int): The season year.
+        competition_id (str): The competition ID.
+    Returns:
+        pd.DataFrame: Slice of squad_index_df with 'player_id', 'minutes_played', 'goals', 'assists',
+        'yellow_cards', 'red_cards' and 'total_games', sorted by player_id (empty if there are none).
+    """
+    start, stop = squad_offsets.get((club_id, season, competition_id), (0, 0))
+    return squad_index_df.iloc[start:stop].reset_index(drop=True)
+
+
+def get_squad_players(club_id, season, competition_id):
+    """
+    Retrieve the rows of players_df of the players of a club in a season and competition, in players_df order.
+    """
+    positions = players_row_index.get_indexer(get_squad(club_id, season, competition_id)['player_id'])
+    return players_df.iloc[np.sort(positions[positions >= 0])]
+
+
+def team_context_key(club_id, season, competition_id):
+    """
+    The data of the team-context-store: the selection the team context belongs to, or None if it is incomplete.
+    """
+    if club_id is None or season is None or competition_id is None:
+        return None
+    return {'club_id': club_id, 'season': season, 'competition_id': competition_id}
+
+
+@lru_cache(maxsize=64)
+@cached_result
+def get_team_context(club_id, season, competition_id):
+    """
+    Compute the data the team charts share for a club in a season and competition, once per selection: the squad
+    aggregates and the squad players with their market value in the season. The result is cached in the process
+    and, with the disk backend, in the figure cache all gunicorn workers share. Callers must copy the frames before
+    modifying them.
+
+    Args:
+        club_id (int): The club ID.
+        season (int): The season year.
+        competition_id (str): The competition ID.
+    Returns:
+        dict: 'squad', the get_squad aggregates sorted by player_id, and 'players', the rows of players_df of the
+        squad in players_df order with 'current_market_value_in_eur' (NaN without a valuation), the squad
+        aggregates and 'player_label'.
+    """
+    squad = get_squad(club_id, season, competition_id).drop(columns=['club_id', 'season', 'competition_id'])
+    players = get_squad_players(club_id, season, competition_id)
+
+    evaluation = get_player_market_value_by_season(players, season, competition_id)
+    evaluation = evaluation.rename(columns={'market_value_in_eur': 'current_market_value_in_eur'})
+    players = players.merge(evaluation, on='player_id', how='left').merge(squad, on='player_id', how='left')
+    players['player_label'] = generate_player_label(players)
+    return {'squad': squad, 'players': players}
+
+
+def get_valued_team_players(context_key):
+    """
+    Copy of the players of the team context that have a market value in the season.
+    """
+    players = get_team_context(**context_key)['players']
+    return players[players['current_market_value_in_eur'].notna()].copy()
 
 
 def load_team_games_data(team_id, season=None, competition_type=None, home_away=None):
@@ -228,52 +576,8 @@ def load_team_games_data(team_id, season=None, competition_type=None, home_away=
     Returns:
         pd.DataFrame: Processed and filtered DataFrame ready for visualization.
     """
-    games_df = pd.read_csv('data/games.csv')
-    competitions_df = pd.read_csv('data/competitions.csv')
-
-    # Filter games for the selected team
-    team_games_df = games_df[
-        (games_df['home_club_id'] == team_id) | (games_df['away_club_id'] == team_id)
-        ].copy()
-
-    # Determine game result for the selected team
-    def determine_result(row):
-        if (row['home_club_id'] == team_id and row['home_club_goals'] > row['away_club_goals']) or \
-                (row['away_club_id'] == team_id and row['away_club_goals'] > row['home_club_goals']):
-            return 'win'
-        elif row['home_club_goals'] == row['away_club_goals']:
-            return 'draw'
-        else:
-            return 'loss'
-
-    team_games_df['result'] = team_games_df.apply(determine_result, axis=1)
-
-    # Determine Home/Away status
-    team_games_df['home_away'] = team_games_df.apply(
-        lambda row: 'Home' if row['home_club_id'] == team_id else 'Away', axis=1
-    )
-
-    # Add Opponent ID and Name
-    team_games_df['opponent_id'] = team_games_df.apply(
-        lambda row: row['away_club_id'] if row['home_away'] == 'Home' else row['home_club_id'], axis=1
-    )
-    team_games_df['opponent'] = team_games_df.apply(
-        lambda row: row['away_club_name'] if row['home_away'] == 'Home' else row['home_club_name'], axis=1
-    )
-
-    # Add Playing Team Name
-    team_games_df['playing_team_name'] = team_games_df.apply(
-        lambda row: row['home_club_name'] if row['home_away'] == 'Home' else row['away_club_name'], axis=1
-    )
-
-    team_games_df['result'] = team_games_df.apply(determine_result, axis=1)
-
-    # Merge competition type information
-    team_games_df = team_games_df.merge(
-        competitions_df[['competition_id', 'type']],
-        on='competition_id',
-        how='left'
-    )
+    # Result, home/away, opponent and competition type are precomputed in the club-perspective games table
+    team_games_df = get_club_games(team_id).reset_index(drop=True)
 
     # Apply user filters (season, competition type, home/away)
     if season:
@@ -287,16 +591,18 @@ def load_team_games_data(team_id, season=None, competition_type=None, home_away=
 
     # Prepare data for visualization
     # Ensure 'season' is categorical and ordered
+    team_games_df = team_games_df.copy()
     team_games_df['season'] = pd.Categorical(team_games_df['season'], ordered=True)
 
     # Custom hover data for visualization
-    team_games_df['hover_data'] = team_games_df.apply(lambda row: {
-        'date': row['date'],
-        'opponent': row['opponent'],
-        'score': f"{row['home_club_goals']} - {row['away_club_goals']}",
-        'competition': row['type'],
-        'location': row['home_away']
-    }, axis=1)
+    hover_columns = pd.DataFrame({
+        'date': team_games_df['date'],
+        'opponent': team_games_df['opponent'],
+        'score': team_games_df['home_club_goals'].astype(str) + " - " + team_games_df['away_club_goals'].astype(str),
+        'competition': team_games_df['type'],
+        'location': team_games_df['home_away']
+    })
+    team_games_df['hover_data'] = hover_columns.to_dict('records')
 
     return team_games_df
 
@@ -320,48 +626,235 @@ def generate_player_label(team_players):
     )
 
 
-def calculate_player_gpa(player_id, games_df, game_lineups_df):
+def load_player_gpas():
     """
-    Calculate the Game Point Average (GPA) for a specific player based on all games they participated in.
+    Load the precomputed GPA of every player, indexed by player_id. Games of the loaded lineups that are not part of
+    the precomputed GPAs yet (all of them on the first start) are folded in first.
     """
-    # games_df = pd.read_csv('data/games.csv')
-    # game_lineups_df = pd.read_csv('data/game_lineups.csv')
+    gpas = precompute_player_gpas(games_df, gameLineups_df)
+    return gpas.astype({"player_id": "int32"}).set_index("player_id")["gpa"].sort_index()
 
-    # Get all games the player participated in
-    player_games = game_lineups_df[game_lineups_df["player_id"] == player_id]
 
-    # Merge with games_df to get game results
-    merged = player_games.merge(
-        games_df[["game_id", "home_club_id", "away_club_id", "home_club_goals", "away_club_goals"]],
-        on="game_id",
-        how="inner"
-    )
+def load_player_season_gpas():
+    """
+    Load the precomputed GPA of every player per season and competition, indexed by (player_id, season,
+    competition_id).
+    """
+    gpas = pd.read_csv(season_output_path, dtype={"player_id": "int32", "season": "int16", "competition_id": str})
+    return gpas.set_index(["player_id", "season", "competition_id"])["gpa"].sort_index()
+
+
+def load_player_form():
+    """
+    Load the precomputed form of every player going into each of their games, as arrays sorted by
+    game_id * FORM_KEY_STRIDE + player_id.
+    """
+    with np.load(form_output_path) as form:
+        return {"key": form["key"], "form": form["form"]}
+
+
+# Loaded once at startup, so the lineup pitch never recomputes a GPA from the lineups
+player_gpas = load_player_gpas()
+player_season_gpas = load_player_season_gpas()
+player_form = load_player_form()
+
+
+def get_player_gpas(player_ids):
+    """
+    Look up the GPA of several players in the precomputed GPA table.
+
+    Args:
+        player_ids (array-like): Player IDs.
+    Returns:
+        np.ndarray: The GPA of every player, 0.0 for players without games.
+    """
+    return player_gpas.reindex(np.asarray(player_ids), fill_value=0.0).to_numpy()
+
+
+def get_player_season_gpas(player_ids, season, competition_id):
+    """
+    Look up the GPA of several players in a season and competition.
+
+    Args:
+        player_ids (array-like): Player IDs.
+        season (int): The season year.
+        competition_id (str): The competition ID.
+    Returns:
+        np.ndarray: The season GPA of every player, NaN for players without games in that season.
+    """
+    keys = pd.MultiIndex.from_arrays([np.asarray(player_ids), np.full(len(player_ids), season),
+                                      np.full(len(player_ids), str(competition_id))])
+    return player_season_gpas.reindex(keys).to_numpy()
+
+
+def get_player_form(game_id, player_ids):
+    """
+    Look up the form of several players going into a game: the GPA of their previous games, see
+    utils.players_gpas_precompute.FORM_GAMES.
+
+    Args:
+        game_id (int): The game ID.
+        player_ids (array-like): Player IDs.
+    Returns:
+        np.ndarray: The form of every player, NaN for players without previous games.
+    """
+    keys = int(game_id) * FORM_KEY_STRIDE + np.asarray(player_ids, dtype=np.int64)
+    if len(player_form['key']) == 0:
+        return np.full(len(keys), np.nan)
+    positions = np.clip(np.searchsorted(player_form['key'], keys), 0, len(player_form['key']) - 1)
+    found = player_form['key'][positions] == keys
+    # The forms are stored as float32, rounding drops the float32 noise
+    return np.round(np.where(found, player_form['form'][positions], np.nan).astype(np.float64), 4)
+
+
+# Codes of the classified game events, one event of gameEvents_df can give several (a goal and its assist)
+EVENT_GOAL = 1
+EVENT_OWN_GOAL = 2
+EVENT_ASSIST = 3
+EVENT_YELLOW_CARD = 4
+EVENT_SECOND_YELLOW_CARD = 5
+EVENT_RED_CARD = 6
+
+
+def build_game_event_index(events):
+    """
+    Classify the goal and card events once by their type and description and index them by game.
+
+    Args:
+        events (pd.DataFrame): DataFrame of game events with 'game_id', 'type', 'player_id', 'description' and
+            'player_assist_id'.
+    Returns:
+        dict: 'game_id' (sorted), 'player_id' and 'code' arrays with one entry per classified event. Within a game
+        the entries keep the order of events, an assist follows its goal.
+    """
+    event_type = events['type'].astype(str).to_numpy()
+    description = events['description'].fillna('').astype(str).str.lower()
+    is_goal = event_type == 'Goals'
+    is_card = event_type == 'Cards'
+
+    own_goal = is_goal & description.str.contains('own-goal|own goal').to_numpy()
+    goal = is_goal & ~own_goal & description.str.contains('header|goal|shot').to_numpy()
+    assist = is_goal & ~own_goal & events['player_assist_id'].notna().to_numpy()
+    second_yellow = is_card & description.str.contains('second yellow').to_numpy()
+    red = is_card & ~second_yellow & description.str.contains('red card').to_numpy()
+    yellow = is_card & ~second_yellow & ~red & description.str.contains('yellow').to_numpy()
+
+    game_ids = events['game_id'].to_numpy(np.int64)
+    player_ids = pd.to_numeric(events['player_id'], errors='coerce').fillna(-1).to_numpy(np.int64)
+    assist_ids = pd.to_numeric(events['player_assist_id'], errors='coerce').fillna(-1).to_numpy(np.int64)
+    rows = np.arange(len(events))
+
+    code = np.select([goal, own_goal, second_yellow, red, yellow],
+                     [EVENT_GOAL, EVENT_OWN_GOAL, EVENT_SECOND_YELLOW_CARD, EVENT_RED_CARD, EVENT_YELLOW_CARD], 0)
+    classified = code > 0
+    entry_rows = np.concatenate([rows[classified], rows[assist]])
+    entries = {
+        'game_id': np.concatenate([game_ids[classified], game_ids[assist]]),
+        'player_id': np.concatenate([player_ids[classified], assist_ids[assist]]),
+        'code': np.concatenate([code[classified], np.full(assist.sum(), EVENT_ASSIST)]).astype(np.int8),
+    }
+    order = np.lexsort((entry_rows, entries['game_id']))
+    return {name: values[order] for name, values in entries.items()}
+
+
+# Built once at startup, the lineup pitch slices the events of a game instead of scanning and parsing gameEvents_df
+game_event_index = build_game_event_index(gameEvents_df)
+
+
+def get_game_events(game_id):
+    """
+    Retrieve the classified events of a game.
+
+    Args:
+        game_id (int): The game ID.
+    Returns:
+        tuple: Arrays of the player IDs and event codes (EVENT_GOAL, ...) of the game, in the order of the events.
+    """
+    start, stop = np.searchsorted(game_event_index['game_id'], [game_id, game_id + 1])
+    return game_event_index['player_id'][start:stop], game_event_index['code'][start:stop]
+
+
+# Lineup keys combine game and club, so one sorted array finds the lineup of a club in a game
+LINEUP_KEY_STRIDE = 1_000_000
+
+
+def build_lineup_index(lineups):
+    """
+    Index the rows of the lineups by (game_id, club_id).
+
+    Args:
+        lineups (pd.DataFrame): DataFrame of game lineups with at least 'game_id' and 'club_id'.
+    Returns:
+        dict: 'key' (sorted unique game_id * LINEUP_KEY_STRIDE + club_id), 'offsets' (start of every key in 'rows'
+        plus the end) and 'rows' (positions in lineups sorted by key, in table order within a key).
+    """
+    keys = lineups['game_id'].to_numpy(np.int64) * LINEUP_KEY_STRIDE + lineups['club_id'].to_numpy(np.int64)
+    rows = np.argsort(keys, kind='stable')
+    unique_keys, starts = np.unique(keys[rows], return_index=True)
+    return {'key': unique_keys, 'offsets': np.append(starts, len(rows)), 'rows': rows.astype(np.int32)}
+
+
+def build_games_with_lineups(lineups):
+    """
+    Bitset of the games with a lineup: position game_id is True if the game has one.
+    """
+    game_ids = lineups['game_id'].to_numpy(np.int64)
+    games_with_lineups = np.zeros(game_ids.max() + 1 if len(game_ids) else 0, dtype=bool)
+    games_with_lineups[game_ids] = True
+    return games_with_lineups
+
+
+# Built once at startup, so the lineup of a game and the games with lineups are found without scanning gameLineups_df
+lineup_index = build_lineup_index(gameLineups_df)
+games_with_lineups = build_games_with_lineups(gameLineups_df)
 
-    # Determine the result for each game
-    def determine_game_points(row):
-        if row["club_id"] == row["home_club_id"]:  # Player's team was the home team
-            if row["home_club_goals"] > row["away_club_goals"]:
-                return 3  # Win
-            elif row["home_club_goals"] == row["away_club_goals"]:
-                return 1  # Draw
-            else:
-                return 0  # Loss
-        elif row["club_id"] == row["away_club_id"]:  # Player's team was the away team
-            if row["away_club_goals"] > row["home_club_goals"]:
-                return 3  # Win
-            elif row["away_club_goals"] == row["home_club_goals"]:
-                return 1  # Draw
-            else:
-                return 0  # Loss
-        return 0  # No points if something goes wrong - not optimal because it could change the average - possible ToDo
-
-    # Calculate points for each game
-    merged["points"] = merged.apply(determine_game_points, axis=1)
-
-    # Calculate GPA
-    if not merged.empty:
-        return merged["points"].mean()
-    return 0.0  # Return 0 if the player has no games
+
+def get_game_lineup(game_id, club_id):
+    """
+    Retrieve the lineup of a club in a game.
+
+    Args:
+        game_id (int): The game ID.
+        club_id (int): The club ID.
+    Returns:
+        pd.DataFrame: The rows of gameLineups_df of the club in the game, in table order (empty if there are none).
+    """
+    key = int(game_id) * LINEUP_KEY_STRIDE + int(club_id)
+    position = np.searchsorted(lineup_index['key'], key)
+    if position == len(lineup_index['key']) or lineup_index['key'][position] != key:
+        return gameLineups_df.iloc[:0]
+    start, stop = lineup_index['offsets'][position], lineup_index['offsets'][position + 1]
+    return gameLineups_df.iloc[lineup_index['rows'][start:stop]]
+
+
+def has_lineups(game_ids):
+    """
+    Check which games have a lineup.
+
+    Args:
+        game_ids (array-like): Game IDs.
+    Returns:
+        np.ndarray: True for every game with a lineup.
+    """
+    game_ids = np.asarray(game_ids, dtype=np.int64)
+    in_range = (game_ids >= 0) & (game_ids < len(games_with_lineups))
+    return in_range & games_with_lineups[np.where(in_range, game_ids, 0)] if len(games_with_lineups) else in_range
+
+
+# Row position of every game by game_id, so a single game is found without scanning games_df
+games_row_index = pd.Index(games_df['game_id'])
+
+
+def get_game(game_id):
+    """
+    Retrieve a single game.
+
+    Args:
+        game_id (int): The game ID.
+    Returns:
+        pd.Series: The row of games_df of the game. Raises a KeyError if there is no such game.
+    """
+    return games_df.iloc[games_row_index.get_loc(game_id)]
 
 
 def format_market_value(value):
@@ -822,3 +1315,93 @@ def get_club_shorthand(full_name):
     })
 
     return club_name_to_shorthand.get(full_name, full_name)
+
+
+# Club names by club ID, shortened once at startup
+club_shorthands = pd.Series([get_club_shorthand(name) for name in clubs_df['name']], index=clubs_df['club_id'].to_numpy())
+club_shorthands = club_shorthands[~club_shorthands.index.duplicated()]
+
+
+def get_club_shorthands(club_ids):
+    """
+    Look up the shorthand names of several clubs, "Unknown" for clubs that are not in clubs_df.
+
+    Args:
+        club_ids (array-like): Club IDs.
+    Returns:
+        np.ndarray: The shorthand name of every club.
+    """
+    return club_shorthands.reindex(np.asarray(club_ids)).fillna("Unknown").to_numpy()
+
+
+def build_standings_index(standings):
+    """
+    Split the precomputed league tables into one table per (competition_id, season), with the shorthand club names
+    as 'Team'.
+
+    Returns:
+        dict: (competition_id, season) -> DataFrame with the RANKING_COLUMNS, sorted by rank.
+    """
+    standings = standings.assign(Team=standings['Team'].map(
+        {name: get_club_shorthand(name) for name in standings['Team'].dropna().unique()}))
+    return {
+        (competition_id, int(season)): table[RANKING_COLUMNS].reset_index(drop=True)
+        for (competition_id, season), table in standings.groupby(['competition_id', 'season'], observed=True,
+                                                                  sort=False)
+    }
+
+
+# Built once at startup, so selecting a competition and season only looks up its table
+standings_index = build_standings_index(standings_df)
+
+
+def get_standings(competition_id, season):
+    """
+    Retrieve the final league table of a competition and season.
+
+    Args:
+        competition_id (str): The competition ID.
+        season (int): The season year.
+    Returns:
+        pd.DataFrame: The RANKING_COLUMNS, one row per club, sorted by rank. Empty if there were no games.
+    """
+    return standings_index.get((competition_id, season), pd.DataFrame(columns=RANKING_COLUMNS))
+
+
+# Built once at startup: the table after every matchday, so scrubbing through a season never recomputes it
+standings_history = calculate_standings_history(games_df)
+
+
+def get_matchday_dates(competition_id, season):
+    """
+    Retrieve the last day of every matchday of a competition and season, an empty array if there were no games.
+    """
+    history = standings_history.get((competition_id, season))
+    return history['date'] if history is not None else np.array([], dtype='datetime64[D]')
+
+
+def get_standings_at(competition_id, season, matchday):
+    """
+    Retrieve the league table of a competition and season after a matchday.
+
+    Args:
+        competition_id (str): The competition ID.
+        season (int): The season year.
+        matchday (int): Index of the matchday, starting at 0, see get_matchday_dates.
+    Returns:
+        pd.DataFrame: The RANKING_COLUMNS, one row per club, sorted by rank.
+    """
+    history = standings_history.get((competition_id, season))
+    if history is None:
+        return pd.DataFrame(columns=RANKING_COLUMNS)
+
+    matchday = min(max(matchday, 0), len(history['date']) - 1)
+    table = pd.DataFrame({
+        'club_id': history['club_id'],
+        **{name: history[name][matchday].astype(np.int64) for name in ['Wins', 'Losses', 'Draws', 'GF', 'GA',
+                                                                       'Points', 'Rank']},
+    })
+    table['GD'] = table['GF'] - table['GA']
+    team_names = get_standings(competition_id, season).set_index('club_id')['Team']
+    table['Team'] = table['club_id'].map(team_names)
+    return table.sort_values('Rank').reset_index(drop=True)[RANKING_COLUMNS]
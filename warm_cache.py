@@ -0,0 +1,141 @@
+import argparse
+import multiprocessing
+import os
+import time
+
+# The warm-up only pays off when the app reads the same figures, i.e. from the shared disk cache
+os.environ["FOOTBALLVIS_FIGURE_CACHE"] = "disk"
+
+import app  # noqa: E402 - loads the tables and registers all callbacks
+from components import (competition_clubs_value, competition_standing, competition_winloss, team_games_success,  # noqa: E402
+                        team_market_value_bar_chart, team_playtime_marketvalue, team_selector, team_top_scorer,
+                        team_treemap)
+from utils.consts import games_df, seasons_df  # noqa: E402
+from utils.utilsFunctions import get_clubs_from_games, get_games_by_competition_and_season  # noqa: E402
+
+WIN_LOSS_SCOPES = ["complete", "home", "away"]
+CLUBS_VALUE_SCOPES = ["all", "Attack", "Midfield", "Defender", "Goalkeeper"]
+SCORER_CHART_MODES = ["scorer_points", "goals", "assists"]
+# Data of the treemap-store and the clicked-player-store right after a team is selected
+INITIAL_TREEMAP_DATA = {'path': [], 'player_id': None}
+INITIAL_CLICKED_PLAYER = None
+
+
+def season_figures(competition_id, season):
+    """
+    List the figure callbacks with the arguments the app calls them with when a competition and season, and then
+    one of its teams, is selected. The arguments must be the values the browser sends, e.g. plain ints. The table
+    data of the standings is cached like a figure.
+
+    Returns:
+        tuple: The list of (callback, arguments) and the number of clubs whose team context failed.
+    """
+    figures = []
+    last_matchday = competition_standing.update_matchday_slider(competition_id, season)[2]
+    figures.append((competition_standing.update_rankings, (competition_id, season, last_matchday)))
+    for scope in WIN_LOSS_SCOPES:
+        figures.append((competition_winloss.update_win_loss_figure, (competition_id, season, scope)))
+    for scope in CLUBS_VALUE_SCOPES:
+        figures.append((competition_clubs_value.update_clubs_value_figure, (competition_id, season, scope)))
+
+    failed_clubs = 0
+    season_games = get_games_by_competition_and_season(games_df, competition_id, season)
+    for club_id in get_clubs_from_games(season_games)['club_id'].tolist():
+        # A failing club only loses its own figures, not those of the competition and the other clubs
+        try:
+            team_context = team_selector.update_team_context(club_id, season, competition_id)
+        except Exception as e:
+            print(f"Error computing the team context of {club_id} in {competition_id} {season}: {e}")
+            failed_clubs += 1
+            continue
+        if team_context is None:
+            # update_team_context logged why, the app shows empty team charts for this club
+            failed_clubs += 1
+            continue
+
+        figures += [
+            (team_games_success.update_team_games_scatterplot, (club_id, season, competition_id)),
+            (team_treemap.update_team_treemap_chart, (team_context,)),
+            (team_market_value_bar_chart.update_market_value_bar_chart,
+             (team_context, INITIAL_TREEMAP_DATA, INITIAL_CLICKED_PLAYER)),
+            (team_playtime_marketvalue.update_playtime_marketvalue,
+             (team_context, INITIAL_TREEMAP_DATA, INITIAL_CLICKED_PLAYER)),
+        ]
+        for mode in SCORER_CHART_MODES:
+            figures.append((team_top_scorer.update_top_scorers_graph,
+                            (team_context, mode, INITIAL_TREEMAP_DATA, INITIAL_CLICKED_PLAYER)))
+    return figures, failed_clubs
+
+
+def warm_season(selection):
+    """
+    Render all figures of a competition and season into the figure cache.
+
+    Returns:
+        tuple: The competition ID, the season, the number of rendered figures and the number of failed figures and
+        clubs.
+    """
+    competition_id, season = selection
+    rendered = 0
+    try:
+        figures, failed = season_figures(competition_id, season)
+    except Exception as e:
+        print(f"Error listing the figures of {competition_id} {season}: {e}")
+        return competition_id, season, 0, 1
+
+    for figure_callback, args in figures:
+        try:
+            figure_callback(*args)
+            rendered += 1
+        except Exception as e:
+            # Callbacks that fail in the app fail here as well, e.g. for a squad without valuations
+            print(f"Error rendering {figure_callback.__name__}{args}: {e}")
+            failed += 1
+    return competition_id, season, rendered, failed
+
+
+def select_seasons(num_seasons=None, competition_ids=None):
+    """
+    List the (competition_id, season) pairs of seasons.csv, most recent first.
+
+    Args:
+        num_seasons (int): Only the pairs of the most recent num_seasons seasons, all seasons if None.
+        competition_ids (list): Only the pairs of these competitions, all competitions if None.
+    """
+    seasons = seasons_df[['competition_id', 'season']].astype({'competition_id': str, 'season': int})
+    if competition_ids:
+        seasons = seasons[seasons['competition_id'].isin(competition_ids)]
+    if num_seasons is not None:
+        recent_seasons = sorted(seasons['season'].unique(), reverse=True)[:num_seasons]
+        seasons = seasons[seasons['season'].isin(recent_seasons)]
+    seasons = seasons.sort_values(['season', 'competition_id'], ascending=[False, True])
+    return [(competition_id, int(season)) for competition_id, season in seasons.itertuples(index=False)]
+
+
+def warm_cache(num_seasons=None, competition_ids=None, processes=None):
+    """
+    Render the figures of all selected competitions and seasons into the disk figure cache with a process pool.
+    """
+    selections = select_seasons(num_seasons, competition_ids)
+    print(f"Warming the figure cache for {len(selections)} competition seasons...")
+
+    # Forked workers inherit the loaded tables instead of loading them again
+    start_method = "fork" if "fork" in multiprocessing.get_all_start_methods() else None
+    start = time.perf_counter()
+    total_rendered, total_failed = 0, 0
+    with multiprocessing.get_context(start_method).Pool(processes) as pool:
+        for i, (competition_id, season, rendered, failed) in enumerate(pool.imap_unordered(warm_season, selections)):
+            total_rendered += rendered
+            total_failed += failed
+            print(f"{i + 1}/{len(selections)} {competition_id} {season}: {rendered} figures rendered, {failed} failed.")
+
+    print(f"Rendered {total_rendered} figures ({total_failed} failed) in {time.perf_counter() - start:.1f}s.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render the figures of the dashboard into the disk figure cache.")
+    parser.add_argument("--seasons", type=int, default=None, help="Only the N most recent seasons.")
+    parser.add_argument("--competitions", nargs="+", default=None, help="Only these competition IDs, e.g. GB1 L1.")
+    parser.add_argument("--processes", type=int, default=None, help="Number of worker processes (default: CPUs).")
+    args = parser.parse_args()
+    warm_cache(args.seasons, args.competitions, args.processes)